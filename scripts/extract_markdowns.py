@@ -2,77 +2,92 @@
 Helper script that splits and print all categories by hardcoding sections, to explore data consistency
 """
 
+import mmap
 import os
+import re
 from pathlib import Path
 
 
-INTRO_START = "# "
-FILENAME_PATTERNS_START = "## **1"
-UPLOAD_SCHEDULE_START = "## **2"
-VOLUME_CHARACTERISTICS_START = "## **3"
-DAY_OF_WEEK_START = "## **4"
-RECURRING_PATTERNS_START = "## **5"
-COMMENTS_FOR_ANALYST_START = "## **6"
-
-
-def extract_text_chunk(
-    text: str, start_marker: str, end_marker: str, end_of_file: bool = False
-):
+INTRO_START = b"# "
+FILENAME_PATTERNS_START = b"## **1"
+UPLOAD_SCHEDULE_START = b"## **2"
+VOLUME_CHARACTERISTICS_START = b"## **3"
+DAY_OF_WEEK_START = b"## **4"
+RECURRING_PATTERNS_START = b"## **5"
+COMMENTS_FOR_ANALYST_START = b"## **6"
+
+SECTION_MARKERS = [
+    INTRO_START,
+    FILENAME_PATTERNS_START,
+    UPLOAD_SCHEDULE_START,
+    VOLUME_CHARACTERISTICS_START,
+    DAY_OF_WEEK_START,
+    RECURRING_PATTERNS_START,
+    COMMENTS_FOR_ANALYST_START,
+]
+SECTION_RE = re.compile(
+    b"(?m)^(?:" + b"|".join(re.escape(marker) for marker in SECTION_MARKERS) + b")"
+)
+
+
+def split_sections(buffer: bytes | mmap.mmap) -> dict[bytes, str]:
     """
-    Extracts the content between two markers (inclusive of start_marker).
-    If end_of_file=True, extracts from start_marker until the end of the file.
+    Splits the UTF-8 buffer into sections with a single scan over the section markers.
+    Each section runs from its marker (inclusive) to the next section marker,
+    the last one runs until the end of the file. Missing markers give "".
+    Only the extracted slices are decoded to str.
     """
-    start_idx = text.find(start_marker)
-    if start_idx == -1:
-        return ""  # start marker not found
-
-    if end_of_file:
-        return text[start_idx:].rstrip()
-
-    end_idx = text.find(end_marker, start_idx + len(start_marker))
-    if end_idx == -1:
-        return ""  # end marker not found
-
-    return text[start_idx:end_idx].rstrip()
+    last_marker = SECTION_MARKERS[-1]
+    starts: dict[bytes, int] = {}
+    for match in SECTION_RE.finditer(buffer):
+        marker = match.group(0)
+        starts.setdefault(marker, match.start())
+        if marker == last_marker:
+            break  # the last section runs until the end of the file
+
+    sections: dict[bytes, str] = {}
+    for i, marker in enumerate(SECTION_MARKERS):
+        start_idx = starts.get(marker)
+        if start_idx is None:
+            sections[marker] = ""  # start marker not found
+            continue
+
+        if i == len(SECTION_MARKERS) - 1:
+            sections[marker] = buffer[start_idx:].decode("utf-8").rstrip()
+            continue
+
+        end_idx = starts.get(SECTION_MARKERS[i + 1])
+        if end_idx is None or end_idx <= start_idx:
+            sections[marker] = ""  # end marker not found
+            continue
+
+        sections[marker] = buffer[start_idx:end_idx].decode("utf-8").rstrip()
+    return sections
 
 
 def read_file_list(md_folder_path: Path):
-    files_list = os.listdir(md_folder_path)
-    files_path = sorted(
-        [
-            os.path.join(md_folder_path, file_path)
-            for file_path in files_list
-            if file_path.lower().endswith(".md")
-        ]
-    )
+    with os.scandir(md_folder_path) as entries:
+        files_path = sorted(
+            Path(entry.path) for entry in entries if entry.name.lower().endswith(".md")
+        )
 
     for file_path in files_path:
 
         print(f"START FILE {file_path}\n")
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-
-        intro_section = extract_text_chunk(
-            content, INTRO_START, FILENAME_PATTERNS_START
-        )
-        filename_section = extract_text_chunk(
-            content, FILENAME_PATTERNS_START, UPLOAD_SCHEDULE_START
-        )
-        file_processing_pattern_section = extract_text_chunk(
-            content, UPLOAD_SCHEDULE_START, VOLUME_CHARACTERISTICS_START
-        )
-        volume_characteristics_section = extract_text_chunk(
-            content, VOLUME_CHARACTERISTICS_START, DAY_OF_WEEK_START
-        )
-        day_of_week_section_pattern = extract_text_chunk(
-            content, DAY_OF_WEEK_START, RECURRING_PATTERNS_START
-        )
-        recurring_patterns_section = extract_text_chunk(
-            content, RECURRING_PATTERNS_START, COMMENTS_FOR_ANALYST_START
-        )
-        comments_for_analyst_section = extract_text_chunk(
-            content, COMMENTS_FOR_ANALYST_START, "", end_of_file=True
-        )
+        with open(file_path, "rb") as f:
+            # mmap can't map a 0-byte file; an empty one just has no sections
+            if os.fstat(f.fileno()).st_size == 0:
+                sections = split_sections(b"")
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                    sections = split_sections(content)
+        intro_section = sections[INTRO_START]
+        filename_section = sections[FILENAME_PATTERNS_START]
+        file_processing_pattern_section = sections[UPLOAD_SCHEDULE_START]
+        volume_characteristics_section = sections[VOLUME_CHARACTERISTICS_START]
+        day_of_week_section_pattern = sections[DAY_OF_WEEK_START]
+        recurring_patterns_section = sections[RECURRING_PATTERNS_START]
+        comments_for_analyst_section = sections[COMMENTS_FOR_ANALYST_START]
 
         print("Intro Section:\n", intro_section, "\n", "-" * 50)
         print("\nFilename Patterns Section:\n", filename_section, "\n", "-" * 50)
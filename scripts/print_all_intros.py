@@ -2,16 +2,15 @@
 Simple helper script to print all the intros produced by the initial agent, to explore data consistency
 """
 
-import json
 import os
 from pathlib import Path
 
+import orjson
 
-def get_file_list(folder_path: Path):
-    files_list = os.listdir(folder_path)
-    files_path = sorted(
-        [os.path.join(folder_path, file_path) for file_path in files_list]
-    )
+
+def get_file_list(folder_path: Path) -> list[Path]:
+    with os.scandir(folder_path) as entries:
+        files_path = sorted(Path(entry.path) for entry in entries if entry.is_file())
     return files_path
 
 
@@ -19,9 +18,8 @@ folder_path = Path("custom_outputs")
 files_path = get_file_list(folder_path)
 
 for file_path in files_path:
-    print(f"Working with file {file_path} - {os.path.basename(file_path)}")
+    print(f"Working with file {file_path} - {file_path.name}")
 
-    with open(file_path, "r") as file:
-        file_content = json.load(file)
+    file_content = orjson.loads(file_path.read_bytes())
 
     print(file_content["split_sections"]["markdown_title"])
@@ -0,0 +1,57 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+
+from ai_factory.utils import write_bytes_atomic
+
+CACHE_DIR = Path("custom_outputs") / "_cache"
+# bump when the code around the LLM (postprocess, payload shape) changes its outputs
+CACHE_VERSION = "1"
+
+
+def cache_key(section_text: str, scope: str = "") -> str:
+    """
+    blake2b of the text; scope (see cache_scope) is hashed with it, so the same text
+    under another model, prompt or schema gets another key
+    """
+    text = f"{scope}\n{section_text}" if scope else section_text
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _scope(model: str, instruction: str, schema_name: str) -> str:
+    return f"{CACHE_VERSION}\n{model}\n{cache_key(instruction)}\n{schema_name}"
+
+
+def cache_scope(agent, output_schema=None) -> str:
+    """
+    Everything besides the input text that decides an agent's output: model, instruction
+    and output schema (output_schema stands in for agents built without one)
+    """
+    model = getattr(agent.model, "model", agent.model)
+    schema = output_schema or agent.output_schema
+    return _scope(str(model), str(agent.instruction), schema.__name__ if schema else "")
+
+
+def _cache_path(agent_name: str, section_text: str, scope: str) -> Path:
+    return CACHE_DIR / agent_name / f"{cache_key(section_text, scope)}.json"
+
+
+def get_cached(agent_name: str, section_text: str, scope: str = ""):
+    """
+    Returns the stored output of agent_name for this exact input text and scope, or None
+    on a miss
+    """
+    path = _cache_path(agent_name, section_text, scope)
+    try:
+        return orjson.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def put_cached(agent_name: str, section_text: str, output, scope: str = ""):
+    path = _cache_path(agent_name, section_text, scope)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_bytes_atomic(path, orjson.dumps(output, option=orjson.OPT_NON_STR_KEYS))
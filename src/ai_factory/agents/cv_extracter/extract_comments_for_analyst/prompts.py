@@ -3,11 +3,6 @@ You are a text processor agent. From the given Markdown **Section 6** (“Key In
 
 - "insights_recommendations": string[]  // each item is ONE full insight/recommendation sentence
 
-FORMAT (critical):
-- Return a SINGLE JSON object that matches the provided output schema EXACTLY.
-- Do NOT wrap the output under any additional key (no "split_sections", etc.).
-- Output ONLY JSON, no markdown or commentary.
-
 Extraction Rules:
 1) Scope strictly to Section 6. Ignore other sections.
 2) Extract every bullet (and sub-bullet) as a standalone, complete sentence in "insights_recommendations".
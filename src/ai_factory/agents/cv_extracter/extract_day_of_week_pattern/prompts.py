@@ -88,10 +88,6 @@ MINIMAL MISSING-VALUE FIX (apply after extraction; do not alter any extracted va
   If any are missing, null, or not an object, set that key to {}.
 - Do NOT synthesize numeric stats. If unknown, leave the StatBlock as {}.
 - Do NOT modify flavor, presence, weekday day list/order, entity_weekday list/order, exceptions, general_notes, or column_audit.
-
-OUTPUT
-- Return exactly one JSON object that validates against DayOfWeekPatternOutput.
-- No prose, no markdown, no comments—JSON only.
 """
 
 model_description = """
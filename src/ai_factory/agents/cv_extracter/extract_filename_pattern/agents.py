@@ -1,9 +1,6 @@
-import os
 from pathlib import Path
 
-import asyncio
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 
 from ai_factory.agents.cv_extracter.extract_filename_pattern.schemas import (
@@ -15,11 +12,16 @@ from ai_factory.agents.cv_extracter.extract_filename_pattern.prompts import (
 )
 from ai_factory.agents.cv_extracter.extract_filename_pattern.tools import (
     convert_to_percentage,
+    prefilter_entity_block,
+)
+from ai_factory.agents.cv_extracter.utils import (
+    BATCH_SIZE,
+    CONCURRENCY,
+    process_files,
 )
-from ai_factory.agents.cv_extracter.utils import process_file
 
 
-from ai_factory.utils import get_file_list
+from ai_factory.utils import get_file_list, make_lite_llm, run_main
 from ai_factory.config import config
 
 target_model = config.default_model
@@ -29,7 +31,7 @@ output_key = "filename_pattern_section"
 
 def make_cv_filename_pattern_agent() -> Agent:
     return Agent(
-        model=LiteLlm(model=target_model),
+        model=make_lite_llm(target_model, model_instruction),
         name=model_name,
         instruction=model_instruction,
         description=model_description,
@@ -39,45 +41,32 @@ def make_cv_filename_pattern_agent() -> Agent:
     )
 
 
-cv_filename_pattern_agent = make_cv_filename_pattern_agent()
-
-
 async def main():
-    CONCURRENCY = 20
     OUTPUT_DIR = "custom_outputs/filename_pattern_section"
     file_section = "filename_pattern_section"
 
     app_name = "ai-factory"
     user_id = "thefrancho"
     session_service = InMemorySessionService()
+    cv_filename_pattern_agent = make_cv_filename_pattern_agent()
 
     folder_path = Path("custom_outputs")
-    files_path = [p for p in get_file_list(folder_path) if not os.path.isdir(p)]
-
-    sem = asyncio.Semaphore(CONCURRENCY)
-    tasks = [
-        asyncio.create_task(
-            process_file(
-                output_dir=OUTPUT_DIR,
-                file_section=file_section,
-                output_key=output_key,
-                agent=cv_filename_pattern_agent,
-                session_service=session_service,
-                app_name=app_name,
-                user_id=user_id,
-                file_path=fp,
-                sem=sem,
-            )
-        )
-        for fp in files_path
-    ]
-
-    for coro in asyncio.as_completed(tasks):
-        try:
-            await coro
-        except Exception as e:
-            print(f"Task failed: {e!r}")
+    files_path = get_file_list(folder_path, largest_first=True)
+
+    await process_files(
+        files_path=files_path,
+        concurrency=CONCURRENCY,
+        batch_size=BATCH_SIZE,
+        preprocess=prefilter_entity_block,
+        output_dir=OUTPUT_DIR,
+        file_section=file_section,
+        output_key=output_key,
+        agent=cv_filename_pattern_agent,
+        session_service=session_service,
+        app_name=app_name,
+        user_id=user_id,
+    )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_main(main())
@@ -7,11 +7,6 @@ You are a text processor agent. From the given Markdown section, produce a JSON
 - "entity_counts": object (string -> int)  // empty {} if none
 - "entity_counts_percentage": object (string -> float)  // empty {} if none
 
-FORMAT (very important):
-- Return a SINGLE JSON object that matches the provided output schema EXACTLY.
-- Do NOT wrap the output under any additional key (no "split_sections", no "filename_pattern_section", etc.).
-- Always include both "entity_counts" and "entity_counts_percentage". Use {} (empty object) when there is nothing to report.
-
 Rules:
 1) filename_canonical = the shortest/most concise valid filename format that appears. If multiple exist, pick one; include all candidates in filename_patterns.
 2) filename_patterns = list of all explicit filename patterns found (including the canonical).
@@ -44,7 +39,6 @@ Rules:
 Important:
 - Ignore Markdown headings/formatting.
 - Be resilient to minor typos.
-- Output ONLY the JSON object; no markdown and no commentary.
 
 ---
 EXAMPLES (abbreviated; non-relevant fields shown as empty)
@@ -104,8 +98,8 @@ OUTPUT
   "filename_canonical": "",
   "filename_patterns": [],
   "filename_rules": [],
-  "entity_counts": {"Debito":330,"MVP":330,"Generic":292,"filtered":24},
-  "entity_counts_percentage": {"Debito":39.43,"MVP":39.43,"Generic":34.89,"filtered":2.87}
+  "entity_counts": {"Debito":330,"MVP":330},
+  "entity_counts_percentage": {"Debito":50.0,"MVP":50.0}
 }
 """
 
@@ -1,20 +1,22 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Optional
 
 
 class FilenameSectionOutput(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     filename_canonical: str = Field(description="Canonical filename")
     filename_patterns: List[str] = Field(
         description="List of filename patterns extracted"
     )
     filename_rules: Optional[List[str]] = Field(
-        description="List of rules applied to filenames", default=[]
+        description="List of rules applied to filenames", default_factory=list
     )
     entity_counts: Optional[Dict[str, int]] = Field(
-        description="Mapping of entity to count", default={}
+        description="Mapping of entity to count", default_factory=dict
     )
     entity_counts_percentage: Optional[Dict[str, float]] = Field(
-        description="Mapping of entity to percentage", default={}
+        description="Mapping of entity to percentage", default_factory=dict
     )
 
 
@@ -1,3 +1,11 @@
+import re
+
+import numpy as np
+
+# below this size the numpy array round trip costs more than a plain Python loop
+NUMPY_MIN_KEYS = 64
+
+
 def convert_to_percentage(entity_counts: dict) -> dict:
     """
     Retrieves the volume percentage of each vendor based on the total counts and division.
@@ -11,9 +19,96 @@ def convert_to_percentage(entity_counts: dict) -> dict:
     if not entity_counts:
         return {}
 
-    total = sum(entity_counts.values())
+    if len(entity_counts) < NUMPY_MIN_KEYS:
+        items = list(entity_counts.items())
+        total = 0.0
+        for _, count in items:
+            total += count
+        if total == 0:
+            # Avoid division by zero
+            return dict.fromkeys(entity_counts, 0.0)
+        inv = 100.0 / total
+        return {k: round(count * inv, 2) for k, count in items}
+
+    counts = np.fromiter(
+        entity_counts.values(), dtype=np.float64, count=len(entity_counts)
+    )
+    total = counts.sum()
     if total == 0:
         # Avoid division by zero
-        return {k: 0.0 for k in entity_counts}
+        return dict.fromkeys(entity_counts, 0.0)
+
+    percentages = np.round(counts * (100.0 / total), 2)
+    return dict(zip(entity_counts, percentages.tolist()))
+
+
+def fill_entity_percentages(output: dict) -> dict:
+    """
+    Sets entity_counts_percentage from entity_counts in code, for the callers that run
+    the rules without the convert_to_percentage tool
+    """
+    output["entity_counts_percentage"] = convert_to_percentage(
+        output.get("entity_counts") or {}
+    )
+    return output
+
+
+ENTITY_HEADING_CUES = [
+    "Common entities & counts",
+    "Entities & counts",
+    "Entities (counted in filenames)",
+    "Entities & frequencies",
+    "Entities in filenames",
+    "Entities counted",
+]
+ENTITY_EXCLUSIONS = [
+    "multipart",
+    "date",
+    "calendar",
+    "part",
+    "duplicates",
+    "token",
+    "hash",
+    "prefix",
+    "suffix",
+    "extension",
+    "generic",
+    "filtered",
+    "jobs",
+]
 
-    return {k: (v / total) * 100 for k, v in entity_counts.items()}
+# compiled once at import: one alternation per list so each line is scanned a single time
+ENTITY_HEADING_RE = re.compile(
+    "|".join(re.escape(cue) for cue in ENTITY_HEADING_CUES), re.IGNORECASE
+)
+ENTITY_EXCLUSION_RE = re.compile(
+    "|".join(re.escape(token) for token in ENTITY_EXCLUSIONS), re.IGNORECASE
+)
+ENTITY_LINE_RE = re.compile(
+    r"^\s*(?:[•*\-–—]\s+)?(?P<name>.+?)\s*(?:[–—:≈]|\s-\s)\s*[~≈]?\s*\d"
+)
+
+
+def prefilter_entity_block(md: str) -> str:
+    """
+    Drops the lines of the entity counts block whose entity name hits a hard exclusion,
+    so the LLM never sees (nor spends tokens on) entries it must not count.
+    Everything outside the block is kept as is, and the text is returned unchanged
+    when no entity heading cue is found.
+    """
+    lines = md.splitlines()
+    kept = []
+    in_block = False
+    for line in lines:
+        if ENTITY_HEADING_RE.search(line):
+            in_block = True
+            kept.append(line)
+            continue
+        if in_block and (not line.strip() or line.lstrip().startswith("#")):
+            in_block = False
+        if in_block:
+            match = ENTITY_LINE_RE.match(line)
+            if match and ENTITY_EXCLUSION_RE.search(match.group("name")):
+                continue
+        kept.append(line)
+    return "\n".join(kept)
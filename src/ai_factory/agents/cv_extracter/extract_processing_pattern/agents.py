@@ -1,9 +1,6 @@
-import os
 from pathlib import Path
 
-import asyncio
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 
 from ai_factory.agents.cv_extracter.extract_processing_pattern.schemas import (
@@ -13,10 +10,17 @@ from ai_factory.agents.cv_extracter.extract_processing_pattern.prompts import (
     model_instruction,
     model_description,
 )
-from ai_factory.agents.cv_extracter.utils import process_file
+from ai_factory.agents.cv_extracter.extract_processing_pattern.tools import (
+    fill_status_percentages,
+)
+from ai_factory.agents.cv_extracter.utils import (
+    BATCH_SIZE,
+    CONCURRENCY,
+    process_files,
+)
 
 
-from ai_factory.utils import get_file_list
+from ai_factory.utils import get_file_list, make_lite_llm, run_main
 from ai_factory.config import config
 
 target_model = config.default_model
@@ -26,7 +30,7 @@ output_key = "file_processing_pattern_section"
 
 def make_cv_file_processing_pattern_agent() -> Agent:
     return Agent(
-        model=LiteLlm(model=target_model),
+        model=make_lite_llm(target_model, model_instruction),
         name=model_name,
         instruction=model_instruction,
         description=model_description,
@@ -35,45 +39,32 @@ def make_cv_file_processing_pattern_agent() -> Agent:
     )
 
 
-cv_file_processing_pattern_agent = make_cv_file_processing_pattern_agent()
-
-
 async def main():
     OUTPUT_DIR = "custom_outputs/file_processing_pattern_section"
-    CONCURRENCY = 20
     file_section = "file_processing_pattern_section"
 
     app_name = "ai-factory"
     user_id = "thefrancho"
     session_service = InMemorySessionService()
+    cv_file_processing_pattern_agent = make_cv_file_processing_pattern_agent()
 
     folder_path = Path("custom_outputs")
-    files_path = [p for p in get_file_list(folder_path) if not os.path.isdir(p)]
-
-    sem = asyncio.Semaphore(CONCURRENCY)
-    tasks = [
-        asyncio.create_task(
-            process_file(
-                output_dir=OUTPUT_DIR,
-                file_section=file_section,
-                output_key=output_key,
-                agent=cv_file_processing_pattern_agent,
-                session_service=session_service,
-                app_name=app_name,
-                user_id=user_id,
-                file_path=fp,
-                sem=sem,
-            )
-        )
-        for fp in files_path
-    ]
-
-    for coro in asyncio.as_completed(tasks):
-        try:
-            await coro
-        except Exception as e:
-            print(f"Task failed: {e!r}")
+    files_path = get_file_list(folder_path, largest_first=True)
+
+    await process_files(
+        files_path=files_path,
+        concurrency=CONCURRENCY,
+        batch_size=BATCH_SIZE,
+        postprocess=fill_status_percentages,
+        output_dir=OUTPUT_DIR,
+        file_section=file_section,
+        output_key=output_key,
+        agent=cv_file_processing_pattern_agent,
+        session_service=session_service,
+        app_name=app_name,
+        user_id=user_id,
+    )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_main(main())
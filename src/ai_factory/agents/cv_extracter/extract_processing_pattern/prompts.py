@@ -17,18 +17,8 @@ Requirements:
    • Include ONLY the raw bullet lines from the “File Format Analysis” AND “Processing Status Summary” parts.
    • Do NOT include headings, tables, schedule notes, or any narrative/commentary.
 
-4) status_percentages:
-   • Parse ONLY the processing-status bullets that contain a percentage.
-   • Normalize keys to this exact set when present:
-     - "processed", "empty", "failed", "deleted", "duplicate", "stopped"
-     Mapping examples:
-       "Successfully processed" → "processed"
-       "Failed processing"/"failure"/"failed" → "failed"
-       "Empty files" → "empty"
-       "Deleted files" → "deleted"
-       "Duplicate files" → "duplicate"
-       "Stopped processing" → "stopped"
-   • Values are floats (percentage numbers). Ignore any non-percentage bullets. Do NOT include format bullets or commentary.
+4) status_percentages: set to null, it is computed in code from the bullets.
+   • So copy every processing-status bullet with its percentage, verbatim, into format_and_status_bullets.
 
 5) schedule_notes (optional):
    • Only concise timing/drift notes (e.g., "Overall mean 14:03; two clusters 15:10±20m and 12:15±15m").
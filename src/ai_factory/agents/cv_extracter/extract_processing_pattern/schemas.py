@@ -1,10 +1,12 @@
 from typing import List, Optional, Dict, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 Weekday = Literal["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
 class FileProcessingStatsRow(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     day: Weekday = Field(description="Weekday (Monday to Sunday)")
     mean_files: int = Field(description="Mean files for the day")
     median_files: int = Field(description="Median files for the day")
@@ -17,6 +19,8 @@ class FileProcessingStatsRow(BaseModel):
 
 
 class UploadScheduleRow(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     day: Weekday = Field(description="Weekday (Monday to Sunday)")
     upload_hour_slot_mean_utc: Optional[str] = Field(
         description="Mean upload hour slot in HH:MM (UTC), or None if 'No observed data'",
@@ -0,0 +1,65 @@
+import re
+
+# whole status phrases, scanned on every bullet; when several match, the longest
+# (most specific) one wins, so "Processing failed" is failed and not processed
+STATUS_PATTERNS = {
+    "failed": re.compile(r"\b(?:processing\s+)?fail(?:ed|ures?|ing)?\b", re.IGNORECASE),
+    "empty": re.compile(r"\bempty(?:\s+files?)?\b", re.IGNORECASE),
+    "deleted": re.compile(r"\b(?:deleted|deletions?)(?:\s+files?)?\b", re.IGNORECASE),
+    "duplicate": re.compile(r"\bduplicat(?:e|es|ed)(?:\s+files?)?\b", re.IGNORECASE),
+    "stopped": re.compile(r"\bstopped\b", re.IGNORECASE),
+    "processed": re.compile(
+        r"\b(?:successfully\s+)?processed\b|\bsuccess(?:ful|fully)?\b", re.IGNORECASE
+    ),
+}
+# a phrase right after one of these is negated ("Non-empty", "un-processed")
+NEGATION_RE = re.compile(r"(?:\bnon|\bun|\bnot)[-\s]?$", re.IGNORECASE)
+PERCENTAGE_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*%")
+
+
+def _match_status(bullet: str) -> str | None:
+    best, best_len = None, 0
+    for status, pattern in STATUS_PATTERNS.items():
+        for match in pattern.finditer(bullet):
+            if NEGATION_RE.search(bullet, 0, match.start()):
+                continue
+            if match.end() - match.start() > best_len:
+                best, best_len = status, match.end() - match.start()
+    return best
+
+
+def parse_status_percentages(bullets: list[str]) -> dict:
+    """
+    Builds the normalized status percentages from the processing status bullets.
+
+    Args:
+        bullets (list[str]): The format_and_status_bullets lines of the section
+
+    Returns:
+        dict: status -> percentage for the bullets carrying both a status phrase and a
+            percentage, the first bullet of each status wins
+    """
+    percentages = {}
+    for bullet in bullets:
+        percentage = PERCENTAGE_RE.search(bullet)
+        if percentage is None:
+            continue
+        status = _match_status(bullet)
+        if status is None or status in percentages:
+            continue
+        percentages[status] = float(percentage.group(1).replace(",", "."))
+    return percentages
+
+
+def fill_status_percentages(output: dict) -> dict:
+    """
+    Overrides the LLM status_percentages with the deterministic parse of its own
+    bullets, keeping the LLM value only for statuses no bullet carries
+    """
+    parsed = parse_status_percentages(output.get("format_and_status_bullets") or [])
+    if parsed:
+        output["status_percentages"] = {
+            **(output.get("status_percentages") or {}),
+            **parsed,
+        }
+    return output
@@ -3,11 +3,6 @@ You are a text processor agent. From the given Markdown **Section 5** (“Recurr
 
 - "recurring_patterns": string[]  // each item is ONE full pattern statement
 
-FORMAT (critical):
-- Return a SINGLE JSON object that matches the provided output schema EXACTLY.
-- Do NOT wrap the output under any additional key (no "split_sections", etc.).
-- Output ONLY JSON, no markdown or commentary.
-
 Extraction Rules:
 1) Scope strictly to Section 5. Ignore headers, other sections, and tables outside Section 5.
 2) Extract every pattern as a standalone, complete sentence in "recurring_patterns".
@@ -16,11 +11,11 @@ Extraction Rules:
    - If a bullet has short sub-points on subsequent indented bullets that continue the same idea (e.g., “Upload timing: …” with two date-range sub-bullets), COMBINE them into a single string using "; " to join sub-points.
 3) Preserve all quantitative details and units (percentages, counts, windows, lags, dates, “median/mean/std”, ranges).
 4) Remove markdown decorations (•, -, *, backticks) and leading labels like “- ”, “• ”, “– ”, “— ” while KEEPING the content that follows.
-5) Normalize whitespace; keep original order; avoid duplicates (string-exact dedup).
+5) Keep original order.
 6) If Section 5 contains subheadings (e.g., “Temporal Patterns”, “File Volume and Content Patterns”), include the bullets under them, but do NOT include the subheading text itself unless the line is a pattern sentence.
 7) If nothing matches, output { "recurring_patterns": [] }.
 
-Normalize: Ensure each item ends with a period, fix obvious typos (e.g., “miWutes”→“minutes”), and normalize dashes/range formatting consistently.
+Normalize: fix obvious typos (e.g., “miWutes”→“minutes”).
 Style: Use sentence case for the leading label (e.g., “Empty files: …”), unless the text is a proper noun; preserve all numbers/units.
 
 Examples:
@@ -50,6 +45,19 @@ OUTPUT
 }
 """
 
+batch_model_instruction = """
+
+BATCH MODE
+The input contains the Section 5 text of several CVs, each one wrapped as:
+<<<FILE id>>>
+...section 5 text...
+<<<END id>>>
+
+Process each block independently with ALL the rules above; never merge or move statements between blocks.
+Return a SINGLE JSON object {"results": [{"id": <id>, "output": {"recurring_patterns": [...]}}, ...]}
+with exactly one result per input id, in the same order as the blocks.
+"""
+
 model_description = (
     """ Read and extract the recurring pattern section of the CV text given """
 )
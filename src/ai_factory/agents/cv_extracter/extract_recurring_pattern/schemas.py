@@ -1,6 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List
 
+from ai_factory.agents.cv_extracter.extract_recurring_pattern.tools import (
+    normalize_patterns,
+)
+
 
 class RecurringPatternsSectionOutput(BaseModel):
     recurring_patterns: List[str] = Field(
@@ -9,3 +13,20 @@ class RecurringPatternsSectionOutput(BaseModel):
             "Each item must be a complete sentence/string with all quantitative details preserved."
         )
     )
+
+    @field_validator("recurring_patterns")
+    @classmethod
+    def _normalize(cls, value: List[str]) -> List[str]:
+        # runs inside the agent output validation, so stored outputs are already normalized
+        return normalize_patterns(value)
+
+
+class RecurringPatternsBatchItem(BaseModel):
+    id: int = Field(description="Id of the <<<FILE id>>> block this output belongs to")
+    output: RecurringPatternsSectionOutput
+
+
+class RecurringPatternsBatchOutput(BaseModel):
+    results: List[RecurringPatternsBatchItem] = Field(
+        description="One result per input file block"
+    )
@@ -0,0 +1,24 @@
+import re
+
+DASHES = str.maketrans({"–": "-", "—": "-", "−": "-"})
+MULTI_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_patterns(items: list[str]) -> list[str]:
+    """
+    Applies the deterministic part of the recurring pattern normalization.
+
+    Args:
+        items (list[str]): The pattern statements returned by the LLM
+
+    Returns:
+        list[str]: The statements with dashes unified, whitespace collapsed, a closing
+        period, and exact duplicates removed while keeping the original order
+    """
+    normalized = {}
+    for item in items:
+        text = MULTI_SPACE_RE.sub(" ", item.translate(DASHES)).strip()
+        if not text:
+            continue
+        normalized[text.rstrip(".") + "."] = None
+    return list(normalized)
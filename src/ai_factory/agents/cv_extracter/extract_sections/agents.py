@@ -1,12 +1,7 @@
-import os
 from pathlib import Path
 
-import asyncio
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.genai import types
 
 
 from ai_factory.agents.cv_extracter.extract_sections.schemas import SplitSectionsOutput
@@ -14,10 +9,10 @@ from ai_factory.agents.cv_extracter.extract_sections.prompts import (
     model_instruction,
     model_description,
 )
-from ai_factory.agents.cv_extracter.utils import process_file
+from ai_factory.agents.cv_extracter.utils import CONCURRENCY, process_files
 
 
-from ai_factory.utils import get_file_list
+from ai_factory.utils import get_file_list, make_lite_llm, run_main
 from ai_factory.config import config
 
 target_model = config.default_model
@@ -27,7 +22,7 @@ output_key = "split_sections"
 
 def make_cv_text_splitter_agent() -> Agent:
     return Agent(
-        model=LiteLlm(model=target_model),
+        model=make_lite_llm(target_model, model_instruction),
         name=model_name,
         instruction=model_instruction,
         description=model_description,
@@ -36,45 +31,30 @@ def make_cv_text_splitter_agent() -> Agent:
     )
 
 
-cv_text_splitter_agent = make_cv_text_splitter_agent()
-
-
 async def main():
-    CONCURRENCY = 20
     OUTPUT_DIR = "custom_outputs"
     file_section = ""
 
     app_name = "ai-factory"
     user_id = "thefrancho"
     session_service = InMemorySessionService()
+    cv_text_splitter_agent = make_cv_text_splitter_agent()
 
     folder_path = Path("dataset_files/datasource_cvs")
-    files_path = [p for p in get_file_list(folder_path) if not os.path.isdir(p)]
-
-    sem = asyncio.Semaphore(CONCURRENCY)
-    tasks = [
-        asyncio.create_task(
-            process_file(
-                output_dir=OUTPUT_DIR,
-                file_section=file_section,
-                output_key=output_key,
-                agent=cv_text_splitter_agent,
-                session_service=session_service,
-                app_name=app_name,
-                user_id=user_id,
-                file_path=fp,
-                sem=sem,
-            )
-        )
-        for fp in files_path
-    ]
+    files_path = get_file_list(folder_path, largest_first=True)
 
-    for coro in asyncio.as_completed(tasks):
-        try:
-            await coro
-        except Exception as e:
-            print(f"Task failed: {e!r}")
+    await process_files(
+        files_path=files_path,
+        concurrency=CONCURRENCY,
+        output_dir=OUTPUT_DIR,
+        file_section=file_section,
+        output_key=output_key,
+        agent=cv_text_splitter_agent,
+        session_service=session_service,
+        app_name=app_name,
+        user_id=user_id,
+    )
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_main(main())
@@ -5,6 +5,7 @@ You are a text processor agent, your task is to extract from the md text section
 - datasource_cv_name: Its in general at the end of the text, if not available, should be the original title of the text
 Match minor typos in the text, also, ignore markdown special characters or hierarchy
 Only return the output schema and allow it to save, don't follow up the conversation
+Return ONLY a JSON object {"resource_id": str, "workspace_id": str, "datasource_cv_name": str}, no markdown fences
 """
 
 model_description = """
@@ -3,63 +3,21 @@ You are a robust text→JSON extractor. The source may present Section 3 as eith
 
 - Root: VolumeCharacteristicsOutput
   - presence: PresenceFlags
-  - per_weekday: List[PerWeekdayRow] (7 rows Mon→Sun)
+  - per_weekday: List[PerWeekdayRow] (days present in the source, Mon→Sun)
   - overall: OverallBlock
-  - inference_notes: Optional[List[str]] (include key; null if unused)
+  - inference_notes: Optional[List[str]] (omit if unused)
 
 Do NOT repeat the schema here; it is already enforced downstream. Return ONLY the JSON object, no prose, no markdown.
 
 ----------------------------------------------------------------
 GENERAL PRINCIPLES
 ----------------------------------------------------------------
-- Always include ALL schema keys. Never omit a field.
-- Unknown/absent values → null (Python None). Do NOT output empty objects "{}" or empty arrays "[]".
+- Only output the values actually found in the source. Unknown/absent values may be null or omitted:
+  missing keys, days and sub-objects are filled with nulls downstream, so do NOT spell out null-filled templates.
 - Preserve explicit zeros as numeric 0 / 0.0 (do not convert zeros to null).
 - Numbers must be plain numerics (no thousands separators). Dates are ISO "YYYY-MM-DD".
 - Weekday order is strictly: Mon, Tue, Wed, Thu, Fri, Sat, Sun.
 
-----------------------------------------------------------------
-TEMPLATE-FIRST BUILD STRATEGY (MANDATORY)
-----------------------------------------------------------------
-Always construct the JSON by starting from the template objects below, then overwrite with parsed values. This prevents "{}" from appearing.
-
-TEMPLATES (use these exact key sets when values are unknown):
-- StatBlock:
-  {"min": null, "max": null, "mean": null, "median": null, "mode": null, "stdev": null}
-
-- rows_stats (OverallBlock):
-  {"min": null, "max": null, "mean": null, "median": null, "stdev": null, "mode": null}
-
-- normal_95:
-  {"lo": null, "hi": null}
-
-- max_empty_files_day:
-  {"date": null, "count": null}
-
-- daily_totals:
-  {"min": null, "max": null, "mean": null, "median": null, "stdev": null}
-
-Default PerWeekdayRow for a given day:
-{
-  "day": "<Mon|Tue|Wed|Thu|Fri|Sat|Sun>",
-  "rows": {"min": null, "max": null, "mean": null, "median": null, "mode": null, "stdev": null},
-  "empty_files": {"min": null, "max": null, "mean": null, "median": null, "mode": null, "stdev": null},
-  "duplicated_files": {"min": null, "max": null, "mean": null, "median": null, "mode": null, "stdev": null},
-  "failed_files": {"min": null, "max": null, "mean": null, "median": null, "mode": null, "stdev": null},
-  "analysis_note": null
-}
-
-Default OverallBlock:
-{
-  "file_count": null,
-  "rows_stats": {"min": null, "max": null, "mean": null, "median": null, "stdev": null, "mode": null},
-  "normal_95": {"lo": null, "hi": null},
-  "empty_files": null,
-  "low_rows_files_lt_100": null,
-  "max_empty_files_day": {"date": null, "count": null},
-  "daily_totals": {"min": null, "max": null, "mean": null, "median": null, "stdev": null}
-}
-
 ----------------------------------------------------------------
 DETECT & SET EXTRACTION FLAVOR
 ----------------------------------------------------------------
@@ -73,31 +31,30 @@ DETECT & SET EXTRACTION FLAVOR
 - Both presence flags can be true if both blocks are present.
 
 ----------------------------------------------------------------
-PER-WEEKDAY (PerWeekdayRow) — ALWAYS 7 ROWS
+PER-WEEKDAY (PerWeekdayRow) — DAYS PRESENT IN THE SOURCE
 ----------------------------------------------------------------
-- Always output exactly 7 rows (Mon→Sun). For days absent in the source, keep the default (null-filled) PerWeekdayRow.
-- Each row must have all four StatBlocks fully keyed (never "{}").
-- Fill any available stats from the source; leave unknown fields as null.
-- If the source includes a short per-day commentary, set analysis_note to that string; otherwise keep it null.
+- Output a row only for the days present in the source, in Mon→Sun order (absent days are added downstream).
+- Fill any available stats from the source; leave out unknown fields.
+- If the source includes a short per-day commentary, set analysis_note to that string; otherwise leave it out.
 
 ----------------------------------------------------------------
 OVERALL (OverallBlock) — ALWAYS PRESENT
 ----------------------------------------------------------------
-- Always include the overall object using the Default OverallBlock, then patch in available values.
+- Include the overall object with the available values.
 - Map source fields:
   - file_count → overall.file_count (int)
-  - Per-file distribution (summary statistics) → overall.rows_stats.{min,max,mean,median,stdev,mode} (set mode=null if not provided)
+  - Per-file distribution (summary statistics) → overall.rows_stats.{min,max,mean,median,stdev,mode} (leave mode out if not provided)
   - Normal (95%) interval "A – B" → overall.normal_95.{lo=A, hi=B}
   - Empty files → overall.empty_files (int)
   - Low rows files (<100) → overall.low_rows_files_lt_100 (int)
   - Max empty files day "N (YYYY-MM-DD)" → overall.max_empty_files_day.{count=N, date=YYYY-MM-DD}
   - Daily totals (sum(rows) per day) → overall.daily_totals.{min,max,mean,median,stdev}
-- If any of these are missing, leave the corresponding fields as null (do not remove keys).
+- If any of these are missing, leave the corresponding fields out.
 
 ----------------------------------------------------------------
 MERGING LOGIC (WHEN BOTH FORMATS EXIST)
 ----------------------------------------------------------------
-- Populate per_weekday from the Day-of-Week table (7 rows, nulls where missing).
+- Populate per_weekday from the Day-of-Week table.
 - Populate overall from the Volume Characteristics section.
 - Do not compute or reconcile across blocks; keep each block faithful to its source.
 
@@ -105,22 +62,18 @@ MERGING LOGIC (WHEN BOTH FORMATS EXIST)
 INFERENCE NOTES (OPTIONAL BUT KEY MUST EXIST)
 ----------------------------------------------------------------
 - Provide a short list in inference_notes to explain key normalizations, e.g.:
-  - "Parsed Day-of-Week table for Mon–Sat; inserted null-filled Sun."
+  - "Parsed Day-of-Week table for Mon–Sat; no Sun row in source."
   - "Parsed overall rows_stats and empty_files; normal_95 absent → nulls."
-- If you have nothing to note, set inference_notes to null (do not omit the key).
+- If you have nothing to note, leave inference_notes out.
 
 ----------------------------------------------------------------
 STRICTNESS / FINAL SELF-CHECK BEFORE OUTPUT
 ----------------------------------------------------------------
 Before returning the JSON, verify ALL of the following:
-1) per_weekday has exactly 7 items in Mon→Sun order.
-2) Every StatBlock (weekday and overall sub-blocks) has ALL six keys (min, max, mean, median, mode, stdev); no "{}".
-3) Every weekday row includes "analysis_note" (string or null).
-4) overall includes rows_stats, normal_95, max_empty_files_day, daily_totals — each fully keyed as per templates.
-5) presence flags correctly reflect which sections had real numeric data.
-6) extraction_flavor = "weekday" iff presence.per_weekday_present is true; otherwise "global".
-7) There are NO "{}" anywhere in the JSON. Build from templates so this invariant naturally holds.
-8) inference_notes key is present (either a short list of strings or null).
+1) per_weekday rows are in Mon→Sun order, one per day present in the source.
+2) No value is invented: every number comes from the source.
+3) presence flags correctly reflect which sections had real numeric data.
+4) extraction_flavor = "weekday" iff presence.per_weekday_present is true; otherwise "global".
 
 Return ONLY the final JSON object that conforms to the schema.
 """
@@ -5,30 +5,38 @@ Weekday = Literal["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 Flavor = Literal["weekday", "global"]
 
 
-class StatBlock(BaseModel):
+class DailyTotalsStats(BaseModel):
+    # Sum(rows) per day (global flavor). Base of StatBlock, which only adds mode.
     # Use float for central tendency & dispersion; int for min/max when they are counts.
     min: Optional[int] = Field(default=None, description="Minimum observed value")
     max: Optional[int] = Field(default=None, description="Maximum observed value")
     mean: Optional[float] = Field(default=None, description="Mean value")
     median: Optional[float] = Field(default=None, description="Median value")
-    mode: Optional[float] = Field(default=None, description="Mode value")
     stdev: Optional[float] = Field(
         default=None, description="Standard deviation, if present"
     )
 
 
+class StatBlock(DailyTotalsStats):
+    mode: Optional[float] = Field(default=None, description="Mode value")
+
+
 class PerWeekdayRow(BaseModel):
     day: Weekday = Field(description="Weekday (Monday to Sunday)")
     # The 'rows' block corresponds to 'Total Rows Processed' in Day-of-Week Summary.
     rows: StatBlock = Field(
-        description="Stats for total rows processed on this weekday"
+        default_factory=StatBlock,
+        description="Stats for total rows processed on this weekday",
+    )
+    empty_files: StatBlock = Field(
+        default_factory=StatBlock, description="Stats for empty files on this weekday"
     )
-    empty_files: StatBlock = Field(description="Stats for empty files on this weekday")
     duplicated_files: StatBlock = Field(
-        description="Stats for duplicated files on this weekday"
+        default_factory=StatBlock,
+        description="Stats for duplicated files on this weekday",
     )
     failed_files: StatBlock = Field(
-        description="Stats for failed files on this weekday"
+        default_factory=StatBlock, description="Stats for failed files on this weekday"
     )
     # Optional short narrative if present in the table ("High volume day ...")
     analysis_note: Optional[str] = Field(
@@ -54,22 +62,8 @@ class MaxEmptyFilesDay(BaseModel):
     )
 
 
-class RowsStats(BaseModel):
-    min: Optional[int] = Field(default=None)
-    max: Optional[int] = Field(default=None)
-    mean: Optional[float] = Field(default=None)
-    median: Optional[float] = Field(default=None)
-    stdev: Optional[float] = Field(default=None)
-    mode: Optional[float] = Field(default=None)
-
-
-class DailyTotalsStats(BaseModel):
-    # Sum(rows) per day (global flavor).
-    min: Optional[int] = Field(default=None)
-    max: Optional[int] = Field(default=None)
-    mean: Optional[float] = Field(default=None)
-    median: Optional[float] = Field(default=None)
-    stdev: Optional[float] = Field(default=None)
+# Same fields as StatBlock; one model keeps a single core schema for both
+RowsStats = StatBlock
 
 
 class OverallBlock(BaseModel):
@@ -113,9 +107,10 @@ class VolumeCharacteristicsOutput(BaseModel):
         description="Flags indicating which sub-blocks had real data"
     )
 
-    # Weekday table: ALWAYS 7 rows Mon–Sun; nulls allowed if absent in source.
+    # Weekday table: the days found in the source; tools.fill_volume_defaults completes
+    # it to 7 null-filled rows Mon–Sun after the call.
     per_weekday: List[PerWeekdayRow] = Field(
-        description="Per-weekday stats (rows, empty, duplicated, failed). Must include 7 rows Mon–Sun."
+        description="Per-weekday stats (rows, empty, duplicated, failed), Mon–Sun order."
     )
 
     # Global block from Volume Characteristics: always present with nulls if absent in source.
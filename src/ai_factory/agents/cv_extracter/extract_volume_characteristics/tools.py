@@ -0,0 +1,48 @@
+import copy
+from typing import get_args
+
+from ai_factory.agents.cv_extracter.extract_volume_characteristics.schemas import (
+    OverallBlock,
+    StatBlock,
+    Weekday,
+)
+
+WEEKDAYS = get_args(Weekday)
+STAT_BLOCK_KEYS = ("rows", "empty_files", "duplicated_files", "failed_files")
+
+# null-filled skeletons built once from the schema, the LLM only sends what it found
+DEFAULT_STAT_BLOCK = StatBlock().model_dump()
+DEFAULT_PER_WEEKDAY_ROW = {
+    **{key: DEFAULT_STAT_BLOCK for key in STAT_BLOCK_KEYS},
+    "analysis_note": None,
+}
+DEFAULT_OVERALL = OverallBlock().model_dump()
+
+
+def deep_merge(default: dict, values: dict) -> dict:
+    """
+    Returns a copy of default with values laid over it, recursing into nested dicts
+    so a partial (or empty) sub-object only overrides the keys it carries
+    """
+    merged = copy.deepcopy(default)
+    for key, value in values.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def fill_volume_defaults(output: dict) -> dict:
+    """
+    Completes the LLM output to the full VolumeCharacteristicsOutput shape: 7 weekday
+    rows in Mon→Sun order and every stat block fully keyed, null for unknown values
+    """
+    rows_by_day = {row.get("day"): row for row in output.get("per_weekday") or []}
+    output["per_weekday"] = [
+        deep_merge({"day": day, **DEFAULT_PER_WEEKDAY_ROW}, rows_by_day.get(day, {}))
+        for day in WEEKDAYS
+    ]
+    output["overall"] = deep_merge(DEFAULT_OVERALL, output.get("overall") or {})
+    output.setdefault("inference_notes", None)
+    return output
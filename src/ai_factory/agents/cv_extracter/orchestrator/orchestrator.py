@@ -1,85 +1,157 @@
-import json
 import os
 from pathlib import Path
 import asyncio
+from functools import partial
+
+import orjson
 
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from google.genai import types
-
-from ai_factory.utils import get_file_list
-from ai_factory.agents.cv_extracter.orchestrator.plan import build_overall_workflow
 
-
-async def run_over_folder(file_path: str, sem: asyncio.Semaphore):
+from ai_factory.utils import (
+    get_file_list,
+    make_user_content,
+    run_main,
+    warm_response_formats,
+    write_bytes_atomic,
+)
+from ai_factory.agents.cv_extracter.extract_filename_pattern.tools import (
+    fill_entity_percentages,
+)
+from ai_factory.agents.cv_extracter.extract_processing_pattern.tools import (
+    fill_status_percentages,
+)
+from ai_factory.agents.cv_extracter.extract_volume_characteristics.tools import (
+    fill_volume_defaults,
+)
+from ai_factory.agents.cv_extracter.orchestrator.plan import (
+    FUSED_OUTPUT_KEY,
+    build_overall_workflow,
+)
+
+# with the parallel graph (fused=False) every file fans out to 7 section calls,
+# so in flight requests are 7x this
+CONCURRENCY = int(os.getenv("CV_ORCHESTRATOR_CONCURRENCY", "6"))
+OUTPUT_DIR = Path("custom_outputs/complete_sections")
+
+
+async def run_over_folder(
+    file_path: str,
+    runner: Runner,
+    session_service: InMemorySessionService,
+    app_name: str,
+    user_id: str,
+    sem: asyncio.Semaphore,
+    output_dir: Path = OUTPUT_DIR,
+):
     async with sem:
-        app_name = "ai-factory"
-        user_id = "thefrancho"
-        session_service = InMemorySessionService()
+        file_path = Path(file_path)
+        md = await asyncio.to_thread(file_path.read_text, encoding="utf-8")
 
-        overall_workflow = build_overall_workflow()
+        new_message = make_user_content(md)
 
+        # the workflow and runner are shared across files, only the session is per file
         session = await session_service.create_session(
             app_name=app_name, user_id=user_id
         )
-
-        with open(file_path, "r", encoding="utf-8") as f:
-            md = f.read()
-
-        runner = Runner(
-            agent=overall_workflow, app_name=app_name, session_service=session_service
-        )
-        new_message = types.Content(role="user", parts=[types.Part(text=md)])
-
-        # Run splitter -> (title, filename) in parallel
-        async for _ in runner.run_async(
-            user_id=user_id, session_id=session.id, new_message=new_message
-        ):
-            pass
-
-        # Inspect state (all keys written by agents)
-        state = (
-            await session_service.get_session(
+        try:
+            # Run splitter -> section extraction. Stop at the final response of the
+            # last stage (its output_key is already in state); the parallel graph's
+            # events are authored by its sub-agents, so that one runs to the end
+            final_author = runner.agent.sub_agents[-1].name
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session.id, new_message=new_message
+            ):
+                if event.is_final_response() and event.author == final_author:
+                    break
+
+            # Inspect state (all keys written by agents)
+            state = (
+                await session_service.get_session(
+                    app_name=app_name, user_id=user_id, session_id=session.id
+                )
+            ).state
+        finally:
+            # drop the session once read so memory stays bounded by in-flight files
+            await session_service.delete_session(
                 app_name=app_name, user_id=user_id, session_id=session.id
             )
-        ).state
 
+        # the fused workflow nests every section under one key, the parallel one
+        # writes each section to its own state key
+        sections = state.get(FUSED_OUTPUT_KEY) or state
         full_extraction_sections = {
-            "title_section": state["title_section"],
-            "filename_pattern_section": state["filename_pattern_section"],
-            "file_processing_pattern_section": state["file_processing_pattern_section"],
-            "volume_characteristics_section": state["volume_characteristics_section"],
-            "day_of_week_section_pattern": state["day_of_week_section_pattern"],
-            "recurring_patterns_section": state["recurring_patterns_section"],
-            "comments_for_analyst_section": state["comments_for_analyst_section"],
+            "title_section": sections["title_section"],
+            "filename_pattern_section": fill_entity_percentages(
+                sections["filename_pattern_section"]
+            ),
+            "file_processing_pattern_section": fill_status_percentages(
+                sections["file_processing_pattern_section"]
+            ),
+            "volume_characteristics_section": fill_volume_defaults(
+                sections["volume_characteristics_section"]
+            ),
+            "day_of_week_section_pattern": sections[
+                "day_of_week_section_pattern_section"
+            ],
+            "recurring_patterns_section": sections["recurring_patterns_section"],
+            "comments_for_analyst_section": sections["comments_for_analyst_section"],
         }
 
-        output_dir = "custom_outputs/complete_sections"
-
-        os.makedirs(output_dir, exist_ok=True)
-        out_path = os.path.join(output_dir, f"{os.path.basename(file_path)}.json")
-        with open(out_path, "w", encoding="utf-8") as fp:
-            json.dump(full_extraction_sections, fp, ensure_ascii=False, indent=4)
+        # output_dir is created once by main
+        out_path = output_dir / f"{file_path.name}.json"
+        await asyncio.to_thread(
+            write_bytes_atomic,
+            out_path,
+            orjson.dumps(
+                full_extraction_sections,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+            ),
+        )
 
 
 async def main():
-    CONCURRENCY = 3
     folder = "dataset_files/datasource_cvs"
     sem = asyncio.Semaphore(CONCURRENCY)
 
+    # the folder scan runs in a worker thread while the graph is built and warmed,
+    # so no task starts before the agents and their response formats exist
     folder_path = Path(folder)
-    files_path = [p for p in get_file_list(folder_path) if not os.path.isdir(p)]
-
-    tasks = [
-        asyncio.create_task(run_over_folder(file_path=fp, sem=sem)) for fp in files_path
-    ]
-
-    for coro in asyncio.as_completed(tasks):
+    files_future = asyncio.get_running_loop().run_in_executor(
+        None, partial(get_file_list, folder_path, largest_first=True)
+    )
+
+    app_name = "ai-factory"
+    user_id = "thefrancho"
+    session_service = InMemorySessionService()
+    overall_workflow = build_overall_workflow()
+    warm_response_formats(overall_workflow)
+    runner = Runner(
+        agent=overall_workflow, app_name=app_name, session_service=session_service
+    )
+
+    files_path = await files_future
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    async def _run_file(fp: str):
+        # one failing file is reported and must not cancel the rest of the group
         try:
-            await coro
+            await run_over_folder(
+                file_path=fp,
+                runner=runner,
+                session_service=session_service,
+                app_name=app_name,
+                user_id=user_id,
+                sem=sem,
+                output_dir=OUTPUT_DIR,
+            )
         except Exception as e:
-            print(f"Task failed: {e!r}")
+            print(f"Task failed: {fp}: {e!r}")
+
+    async with asyncio.TaskGroup() as tg:
+        for fp in files_path:
+            tg.create_task(_run_file(fp))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_main(main())
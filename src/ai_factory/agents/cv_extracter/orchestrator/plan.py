@@ -25,143 +25,143 @@ from ai_factory.agents.cv_extracter.extract_recurring_pattern.agents import (
 from ai_factory.agents.cv_extracter.extract_comments_for_analyst.agents import (
     make_cv_comments_for_analyst_agent,
 )
+from ai_factory.agents.cv_extracter.orchestrator.schemas import CVSectionsOutput
+from ai_factory.utils import make_lite_llm
+from ai_factory.config import config
+
+STATE_INPUT_TEMPLATE = (
+    "\n\nApply the rules above ONLY to this input and return the JSON "
+    "exactly as specified:\n\n"
+    "{{split_sections.{state_key}}}\n"
+)
 
 
-def build_overall_workflow() -> SequentialAgent:
+def _agent_from_state(agent: Agent, name: str, state_key: str) -> LlmAgent:
     """
-    Build the graph once:
-      1) cv_text_splitter_agent
-      2) Parallel( title_agent_from_state, filename_agent_from_state )
-    IMPORTANT: no module-level construction; this function returns a fresh graph.
+    Wraps a section agent so it reads its input from split_sections.<state_key>.
+    The static rules go first so every file shares the same cacheable prompt prefix.
+    Agents built without output_schema (free-form JSON) get their CVSectionsOutput
+    field back: inside the graph there is no fix-up turn, and one malformed reply
+    would drop every section of the CV
     """
+    output_schema = (
+        agent.output_schema
+        or CVSectionsOutput.model_fields[agent.output_key].annotation
+    )
+    return LlmAgent(
+        model=agent.model,
+        name=name,
+        instruction=agent.instruction
+        + STATE_INPUT_TEMPLATE.format(state_key=state_key),
+        description=agent.description,
+        output_schema=output_schema,
+        output_key=agent.output_key,
+        tools=getattr(agent, "tools", None),
+    )
 
-    cv_text_splitter_agent = make_cv_text_splitter_agent()
 
-    cv_title_pattern_agent = make_cv_title_pattern_agent()
-    title_agent_from_state: Agent = LlmAgent(
-        model=cv_title_pattern_agent.model,
-        name="title_section_processer_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.markdown_title_section}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + "\n"
-        + cv_title_pattern_agent.instruction,
-        description=cv_title_pattern_agent.description,
-        output_schema=cv_title_pattern_agent.output_schema,
-        output_key=cv_title_pattern_agent.output_key,
-        tools=getattr(cv_title_pattern_agent, "tools", None),
-    )
+FUSED_OUTPUT_KEY = "all_sections"
+FUSED_RULES_HEADER = """
+You extract several sections of the same CV in ONE call.
+Return ONE JSON object with one key per section below. The value of each key is
+the object that section's rules describe (their "top-level keys" are its keys).
+Apply each section's rules ONLY to that section's input, never mixing sections.
+No tools are available in this call: where a rule says to CALL a tool, leave that
+field as {} (it is computed after the call).
+"""
+FUSED_INPUTS_HEADER = "\n\nINPUTS (one per section):"
 
-    cv_filename_pattern_agent = make_cv_filename_pattern_agent()
-    filename_agent_from_state: Agent = LlmAgent(
-        model=cv_filename_pattern_agent.model,
-        name="filename_pattern_section_processer_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.filename_pattern_section}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + cv_filename_pattern_agent.instruction,
-        description=cv_filename_pattern_agent.description,
-        output_schema=cv_filename_pattern_agent.output_schema,
-        output_key=cv_filename_pattern_agent.output_key,
-        tools=getattr(cv_filename_pattern_agent, "tools", None),
-    )
+# (factory, parallel flow name, split_sections key holding the section input)
+SECTION_FLOWS = [
+    (
+        make_cv_title_pattern_agent,
+        "title_section_processer_flow",
+        "markdown_title_section",
+    ),
+    (
+        make_cv_filename_pattern_agent,
+        "filename_pattern_section_processer_flow",
+        "filename_pattern_section",
+    ),
+    (
+        make_cv_file_processing_pattern_agent,
+        "file_processing_section_flow",
+        "file_processing_pattern_section",
+    ),
+    (
+        make_cv_volume_characteristics_agent,
+        "volume_characteristics_section_flow",
+        "volume_characteristics_section",
+    ),
+    (
+        make_cv_day_of_week_pattern_agent,
+        "day_of_week_pattern_section_flow",
+        "day_of_week_section_pattern_section",
+    ),
+    (
+        make_cv_recurring_pattern_agent,
+        "recurring_pattern_section_flow",
+        "recurring_patterns_section",
+    ),
+    (
+        make_cv_comments_for_analyst_agent,
+        "cpmments_for_analyst_section_flow",
+        "comments_for_analyst_section",
+    ),
+]
 
-    cv_file_processing_pattern_agent = make_cv_file_processing_pattern_agent()
-    file_processing_agent_from_state: Agent = LlmAgent(
-        model=cv_file_processing_pattern_agent.model,
-        name="file_processing_section_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.file_processing_pattern_section}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + cv_file_processing_pattern_agent.instruction,
-        description=cv_file_processing_pattern_agent.description,
-        output_schema=cv_file_processing_pattern_agent.output_schema,
-        output_key=cv_file_processing_pattern_agent.output_key,
-        tools=getattr(cv_file_processing_pattern_agent, "tools", None),
-    )
 
-    cv_volume_characteristics_agent = make_cv_volume_characteristics_agent()
-    volume_characteristics_agent_from_state: Agent = LlmAgent(
-        model=cv_volume_characteristics_agent.model,
-        name="volume_characteristics_section_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.volume_characteristics_section}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + cv_volume_characteristics_agent.instruction,
-        description=cv_volume_characteristics_agent.description,
-        output_schema=cv_volume_characteristics_agent.output_schema,
-        output_key=cv_volume_characteristics_agent.output_key,
-        tools=getattr(cv_volume_characteristics_agent, "tools", None),
+def _fused_agent(section_agents: list[tuple[Agent, str]]) -> LlmAgent:
+    """
+    Single LlmAgent doing the work of every section agent in one call, writing a
+    CVSectionsOutput under FUSED_OUTPUT_KEY. All rules go first (shared cacheable
+    prefix), then the per-file inputs.
+    It gets no tools: ADK only sends the output_schema as response format to agents
+    without tools, so the section agents' tool work is done by the orchestrator after
+    the call instead
+    """
+    rules = "".join(
+        f"\n\n### SECTION {agent.output_key} RULES\n{agent.instruction}"
+        for agent, _ in section_agents
     )
-
-    cv_day_of_week_pattern_agent = make_cv_day_of_week_pattern_agent()
-    day_of_week_pattern_agent_from_state: Agent = LlmAgent(
-        model=cv_day_of_week_pattern_agent.model,
-        name="day_of_week_pattern_section_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.day_of_week_section_pattern}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + cv_day_of_week_pattern_agent.instruction,
-        description=cv_day_of_week_pattern_agent.description,
-        output_schema=cv_day_of_week_pattern_agent.output_schema,
-        output_key=cv_day_of_week_pattern_agent.output_key,
-        tools=getattr(cv_day_of_week_pattern_agent, "tools", None),
+    inputs = "".join(
+        f"\n\n### SECTION {agent.output_key} INPUT\n{{split_sections.{state_key}}}"
+        for agent, state_key in section_agents
     )
-
-    cv_recurring_pattern_agent = make_cv_recurring_pattern_agent()
-    recurring_pattern_agent_from_state: Agent = LlmAgent(
-        model=cv_recurring_pattern_agent.model,
-        name="recurring_pattern_section_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.recurring_patterns_section}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + cv_recurring_pattern_agent.instruction,
-        description=cv_recurring_pattern_agent.description,
-        output_schema=cv_recurring_pattern_agent.output_schema,
-        output_key=cv_recurring_pattern_agent.output_key,
-        tools=getattr(cv_recurring_pattern_agent, "tools", None),
+    instruction = FUSED_RULES_HEADER + rules + FUSED_INPUTS_HEADER + inputs + "\n"
+    return LlmAgent(
+        model=make_lite_llm(config.default_model, instruction),
+        name="all_sections_processer_flow",
+        instruction=instruction,
+        description="Extract every CV section from the split sections in one call",
+        output_schema=CVSectionsOutput,
+        output_key=FUSED_OUTPUT_KEY,
     )
 
-    cv_comments_for_analyst_agent = make_cv_comments_for_analyst_agent()
-    comments_for_analyst_agent_from_state: Agent = LlmAgent(
-        model=cv_comments_for_analyst_agent.model,
-        name="cpmments_for_analyst_section_flow",
-        instruction=(
-            "Use ONLY this input:\n\n"
-            "{split_sections.comments_for_analyst_section}\n\n"
-            "Then follow these rules and return the JSON exactly as specified:\n\n"
-        )
-        + cv_comments_for_analyst_agent.instruction,
-        description=cv_comments_for_analyst_agent.description,
-        output_schema=cv_comments_for_analyst_agent.output_schema,
-        output_key=cv_comments_for_analyst_agent.output_key,
-        tools=getattr(cv_comments_for_analyst_agent, "tools", None),
-    )
 
-    section_formatter_agent = ParallelAgent(
-        name="ConcurrentFetch",
-        sub_agents=[
-            title_agent_from_state,
-            filename_agent_from_state,
-            file_processing_agent_from_state,
-            volume_characteristics_agent_from_state,
-            day_of_week_pattern_agent_from_state,
-            recurring_pattern_agent_from_state,
-            comments_for_analyst_agent_from_state,
-        ],
-    )
+def build_overall_workflow(fused: bool = True) -> SequentialAgent:
+    """
+    Build the graph once:
+      1) cv_text_splitter_agent
+      2) fused: one LlmAgent extracting all sections into state["all_sections"]
+         else: Parallel( title_agent_from_state, filename_agent_from_state, ... )
+    IMPORTANT: no module-level construction; this function returns a fresh graph.
+    """
+
+    cv_text_splitter_agent = make_cv_text_splitter_agent()
+
+    if fused:
+        section_formatter_agent = _fused_agent(
+            [(factory(), state_key) for factory, _, state_key in SECTION_FLOWS]
+        )
+    else:
+        section_formatter_agent = ParallelAgent(
+            name="ConcurrentFetch",
+            sub_agents=[
+                _agent_from_state(factory(), name, state_key)
+                for factory, name, state_key in SECTION_FLOWS
+            ],
+        )
 
     return SequentialAgent(
         name="FetchAndSynthesize",
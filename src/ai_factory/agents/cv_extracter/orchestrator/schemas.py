@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+
+from ai_factory.agents.cv_extracter.extract_title.schemas import TitleSectionOutput
+from ai_factory.agents.cv_extracter.extract_filename_pattern.schemas import (
+    FilenameSectionOutput,
+)
+from ai_factory.agents.cv_extracter.extract_processing_pattern.schemas import (
+    UploadSectionOutput,
+)
+from ai_factory.agents.cv_extracter.extract_volume_characteristics.schemas import (
+    VolumeCharacteristicsOutput,
+)
+from ai_factory.agents.cv_extracter.extract_day_of_week_pattern.schemas import (
+    DayOfWeekPatternOutput,
+)
+from ai_factory.agents.cv_extracter.extract_recurring_pattern.schemas import (
+    RecurringPatternsSectionOutput,
+)
+from ai_factory.agents.cv_extracter.extract_comments_for_analyst.schemas import (
+    ExtraCommentsForAnalystSectionOutput,
+)
+
+
+class CVSectionsOutput(BaseModel):
+    # one field per section agent, named after that agent's output_key
+    title_section: TitleSectionOutput
+    filename_pattern_section: FilenameSectionOutput
+    file_processing_pattern_section: UploadSectionOutput
+    volume_characteristics_section: VolumeCharacteristicsOutput
+    day_of_week_section_pattern_section: DayOfWeekPatternOutput
+    recurring_patterns_section: RecurringPatternsSectionOutput
+    comments_for_analyst_section: ExtraCommentsForAnalystSectionOutput
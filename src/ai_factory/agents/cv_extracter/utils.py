@@ -1,58 +1,537 @@
-import json
+import hashlib
 import os
+from pathlib import Path
+from typing import Callable, List
 
 import asyncio
+import orjson
 from google.adk.agents import Agent
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
-from google.genai import types
+from pydantic import BaseModel, ValidationError, create_model
 
-CONCURRENCY = 20
+from ai_factory.agents.cv_extracter.cache import (
+    cache_key,
+    cache_scope,
+    get_cached,
+    put_cached,
+)
+from ai_factory.utils import (
+    make_user_content,
+    use_shared_http_client,
+    warm_response_formats,
+    write_bytes_atomic,
+)
+
+# LLM round trips dominate, so the default is sized for provider throughput, not CPUs
+CONCURRENCY = int(os.getenv("CV_EXTRACTOR_CONCURRENCY", "20"))
+BATCH_SIZE = 8
+HASHES_DIR = "_hashes"
+# fix-up turns allowed when a free-form (non guided) JSON output fails validation
+JSON_RETRIES = 1
+
+json_fix_instruction = """
+Your previous answer is not valid for the expected JSON output:
+{error}
+Reply again with ONLY the corrected JSON object, no markdown fences and no extra text.
+"""
+
+batch_model_instruction = """
+
+BATCH MODE
+The input contains several independent texts, each one wrapped as:
+<<<FILE id>>>
+...text...
+<<<END id>>>
+
+Apply ALL the rules above to each text on its own, never mixing information between texts.
+Return a SINGLE JSON object {"results": [{"id": <id>, "output": <object following the rules above>}, ...]}
+with exactly one result per input id.
+"""
+
+
+def _read_file_content(
+    file_path: str, file_section: str, preprocess: Callable[[str], str] | None = None
+) -> str:
+    if file_section:
+        content = orjson.loads(Path(file_path).read_bytes())[file_section]
+    else:
+        # case of full text read and not json read
+        content = Path(file_path).read_text(encoding="utf-8")
+    return preprocess(content) if preprocess else content
+
+
+def _input_digest(file_path: str) -> str:
+    return hashlib.blake2b(Path(file_path).read_bytes(), digest_size=16).hexdigest()
+
+
+def _hash_path(output_dir: str, file_path: str) -> Path:
+    # kept in a sub folder so the hashes are never listed as input files
+    return Path(output_dir) / HASHES_DIR / f"{Path(file_path).name}.hash"
+
+
+def _output_path(output_dir: str, file_path: str) -> Path:
+    return Path(output_dir) / f"{Path(file_path).name}.json"
+
+
+def _write_input_hash(output_dir: str, file_path: str):
+    _hash_path(output_dir, file_path).write_text(
+        _input_digest(file_path), encoding="utf-8"
+    )
+
+
+def _write_output(output_dir: str, file_path: str, output) -> Path:
+    # output_dir and its hashes folder are created once up front by process_files
+    out_path = _output_path(output_dir, file_path)
+    # orjson serializes in C and the whole document goes out in a single write,
+    # renamed into place so an interrupted run never leaves a torn output behind
+    write_bytes_atomic(
+        out_path,
+        orjson.dumps(output, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS),
+    )
+    _write_input_hash(output_dir, file_path)
+    return out_path
+
+
+def _is_up_to_date(output_dir: str, file_path: str) -> bool:
+    try:
+        stored = _hash_path(output_dir, file_path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return True  # output from before input hashes were stored
+    try:
+        return stored == _input_digest(file_path)
+    except OSError:
+        return False  # left pending so the grouping pass logs and skips it
+
+
+def _pending_files(files_path: list[str], output_dir: str) -> list[str]:
+    """
+    Drops the files whose output JSON already exists and whose input is unchanged since
+    that output was written (blake2b of the input file), so reruns only redo edited or
+    new files
+    """
+    try:
+        with os.scandir(output_dir) as entries:
+            done = {entry.name for entry in entries if entry.name.endswith(".json")}
+    except FileNotFoundError:
+        return files_path
+    pending = [
+        fp
+        for fp in files_path
+        if f"{Path(fp).name}.json" not in done or not _is_up_to_date(output_dir, fp)
+    ]
+    skipped = len(files_path) - len(pending)
+    if skipped:
+        print(f"Skipping {skipped} already processed files in {output_dir}")
+    return pending
+
+
+def _group_by_content(
+    files_path: list[str],
+    file_section: str,
+    preprocess: Callable[[str], str] | None = None,
+) -> tuple[list[list[str]], dict[str, str]]:
+    """
+    Groups files whose input text is identical up to whitespace (indentation, trailing
+    spaces, CRLF, blank lines), keyed by a blake2b digest of the collapsed text.
+    The first file of each group is the one sent to the LLM; its already read text is
+    returned by path so the file is not read and parsed a second time.
+    Files that can't be read (bad JSON, missing section) are logged and left out
+    """
+    groups: dict[str, list[str]] = {}
+    contents: dict[str, str] = {}
+    for fp in files_path:
+        try:
+            content = _read_file_content(fp, file_section, preprocess)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Skipping unreadable file {fp}: {e!r}")
+            continue
+        key = cache_key(" ".join(content.split()))
+        if key not in groups:
+            groups[key] = []
+            contents[fp] = content
+        groups[key].append(fp)
+    return list(groups.values()), contents
+
+
+def _copy_duplicate_outputs(output_dir: str, groups: list[list[str]]):
+    """
+    Copies each group leader's output to the rest of its group. Only outputs that match
+    the leader's current input (stored hash equals its blake2b) are copied, so a stale
+    output left by an earlier run whose LLM call failed now is never spread to the
+    duplicates, which stay pending for the next run
+    """
+    for source_fp, *duplicates in groups:
+        source_out = _output_path(output_dir, source_fp)
+        if not duplicates or not source_out.exists():
+            continue
+        try:
+            stored = _hash_path(output_dir, source_fp).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        if stored != _input_digest(source_fp):
+            continue
+        for fp in duplicates:
+            out_path = _output_path(output_dir, fp)
+            write_bytes_atomic(out_path, source_out.read_bytes())
+            _write_input_hash(output_dir, fp)
+            print(f"Done (duplicate of {source_fp}): {out_path}")
+
+
+def parse_json_output(text: str, output_schema: type[BaseModel]) -> dict:
+    """
+    Validates the raw text of an agent run without output_schema (no guided decoding)
+    and returns it in the same shape ADK stores for guided outputs
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    return output_schema.model_validate_json(text).model_dump(exclude_none=True)
+
+
+def make_batch_schema(output_schema: type[BaseModel]) -> type[BaseModel]:
+    """
+    Builds the {"results": [{"id", "output"}, ...]} schema of a batch of output_schema
+    """
+    schema_name = output_schema.__name__
+    batch_item = create_model(
+        f"{schema_name}BatchItem", id=(int, ...), output=(output_schema, ...)
+    )
+    return create_model(f"{schema_name}Batch", results=(List[batch_item], ...))
+
+
+def make_batch_agent(
+    agent: Agent,
+    batch_schema: type[BaseModel] | None = None,
+    batch_instruction: str = batch_model_instruction,
+    output_schema: type[BaseModel] | None = None,
+) -> Agent:
+    """
+    Builds the batch variant of a section agent: same model, rules and output_key, but the
+    output is a list of {"id", "output"} results so several files share one LLM call.
+    output_schema stands in for the item schema of agents built without one, whose
+    batch variant also runs without guided decoding
+    """
+    if batch_schema is None:
+        batch_schema = make_batch_schema(agent.output_schema or output_schema)
+
+    return Agent(
+        model=agent.model,
+        name=f"{agent.name}_batch",
+        instruction=agent.instruction + batch_instruction,
+        description=agent.description,
+        output_schema=batch_schema if agent.output_schema else None,
+        output_key=agent.output_key,
+        tools=agent.tools,
+    )
+
+
+async def _run_agent(
+    runner: Runner,
+    session_service: InMemorySessionService,
+    app_name: str,
+    user_id: str,
+    output_key: str,
+    text: str,
+    output_schema: type[BaseModel] | None = None,
+):
+    # fresh session, the runner is shared across files
+    session = await session_service.create_session(app_name=app_name, user_id=user_id)
+
+    async def _send(text: str):
+        new_message = make_user_content(text)
+        # the runner stores the output_key state before yielding the final response,
+        # so there is nothing left to wait for after it
+        async for event in runner.run_async(
+            user_id=user_id, session_id=session.id, new_message=new_message
+        ):
+            if event.is_final_response():
+                break
+
+        refreshed_state = await session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
+        return refreshed_state.state[output_key]
+
+    try:
+        output = await _send(text)
+        if output_schema is None:
+            return output
+        # free-form JSON: validate after the fact and ask for a fix in the same
+        # session, so the model sees its previous answer next to the error
+        for attempt in range(JSON_RETRIES + 1):
+            try:
+                return parse_json_output(output, output_schema)
+            except ValidationError as e:
+                if attempt == JSON_RETRIES:
+                    raise
+                output = await _send(json_fix_instruction.format(error=e))
+    finally:
+        # drop the session once read so the service only holds the in-flight ones
+        await session_service.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
 
 
 async def process_file(
     output_dir: str,
     file_section: str,
     output_key: str,
-    agent: Agent,
+    runner: Runner,
     session_service: InMemorySessionService,
     app_name: str,
     user_id: str,
     file_path: str,
     sem: asyncio.Semaphore,
+    cache_name: str | None = None,
+    cache_scope: str = "",
+    preprocess: Callable[[str], str] | None = None,
+    postprocess: Callable[[dict], dict] | None = None,
+    output_schema: type[BaseModel] | None = None,
+    file_content: str | None = None,
+):
+    async with sem:
+        print(f"Working with file {file_path} - {Path(file_path).name}")
+
+        if file_content is None:
+            # read + decode off the event loop so in-flight LLM calls keep moving
+            file_content = await asyncio.to_thread(
+                _read_file_content, file_path, file_section, preprocess
+            )
+
+        if cache_name:
+            cached = await asyncio.to_thread(
+                get_cached, cache_name, file_content, cache_scope
+            )
+            if cached is not None:
+                out_path = await asyncio.to_thread(
+                    _write_output, output_dir, file_path, cached
+                )
+                print(f"Done (cached): {out_path}")
+                return
+
+        filename_section = await _run_agent(
+            runner=runner,
+            session_service=session_service,
+            app_name=app_name,
+            user_id=user_id,
+            output_key=output_key,
+            text=file_content,
+            output_schema=output_schema,
+        )
+        if postprocess:
+            filename_section = postprocess(filename_section)
+
+        if cache_name:
+            await asyncio.to_thread(
+                put_cached, cache_name, file_content, filename_section, cache_scope
+            )
+        out_path = await asyncio.to_thread(
+            _write_output, output_dir, file_path, filename_section
+        )
+        print(f"Done: {out_path}")
+
+
+async def process_batch(
+    output_dir: str,
+    file_section: str,
+    output_key: str,
+    runner: Runner,
+    session_service: InMemorySessionService,
+    app_name: str,
+    user_id: str,
+    files_batch: list[str],
+    sem: asyncio.Semaphore,
+    cache_name: str | None = None,
+    cache_scope: str = "",
+    preprocess: Callable[[str], str] | None = None,
+    postprocess: Callable[[dict], dict] | None = None,
+    contents: list[str] | None = None,
+    output_schema: type[BaseModel] | None = None,
 ):
+    """
+    Sends the section of every file in files_batch in a single LLM call (needs a runner
+    over make_batch_agent) and writes each result back to its own output file.
+    Files with a cached output are written directly and left out of the call.
+    contents, when given, are the already read (and preprocessed) inputs.
+    output_schema is the batch schema of a free-form batch agent, the reply is validated
+    against it
+    """
     async with sem:
-        # fresh session
-        session = await session_service.create_session(
-            app_name=app_name, user_id=user_id
+        print(f"Working with batch of {len(files_batch)} files - {files_batch[0]} ...")
+
+        if contents is None:
+            contents = await asyncio.gather(
+                *(
+                    asyncio.to_thread(_read_file_content, fp, file_section, preprocess)
+                    for fp in files_batch
+                )
+            )
+
+        if cache_name:
+            misses = []
+            for file_path, content in zip(files_batch, contents):
+                cached = await asyncio.to_thread(
+                    get_cached, cache_name, content, cache_scope
+                )
+                if cached is None:
+                    misses.append((file_path, content))
+                    continue
+                out_path = await asyncio.to_thread(
+                    _write_output, output_dir, file_path, cached
+                )
+                print(f"Done (cached): {out_path}")
+            if not misses:
+                return
+            files_batch = [file_path for file_path, _ in misses]
+            contents = [content for _, content in misses]
+
+        batch_text = "\n\n".join(
+            f"<<<FILE {i}>>>\n{content}\n<<<END {i}>>>"
+            for i, content in enumerate(contents)
         )
-        runner = Runner(agent=agent, app_name=app_name, session_service=session_service)
 
-        print(f"Working with file {file_path} - {os.path.basename(file_path)}")
+        batch_output = await _run_agent(
+            runner=runner,
+            session_service=session_service,
+            app_name=app_name,
+            user_id=user_id,
+            output_key=output_key,
+            text=batch_text,
+            output_schema=output_schema,
+        )
 
-        if file_section:
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = json.load(f)[file_section]
-        else:  # case of full text read and not json read
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = f.read()
+        outputs = {item["id"]: item["output"] for item in batch_output["results"]}
+        if postprocess:
+            outputs = {i: postprocess(output) for i, output in outputs.items()}
+        for i, file_path in enumerate(files_batch):
+            if i not in outputs:
+                print(f"Task failed: no batch output for {file_path}")
+                continue
+            if cache_name:
+                await asyncio.to_thread(
+                    put_cached, cache_name, contents[i], outputs[i], cache_scope
+                )
+            out_path = await asyncio.to_thread(
+                _write_output, output_dir, file_path, outputs[i]
+            )
+            print(f"Done: {out_path}")
 
-        new_message = types.Content(role="user", parts=[types.Part(text=file_content)])
 
-        # run until completion
-        async for _ in runner.run_async(
-            user_id=user_id, session_id=session.id, new_message=new_message
-        ):
-            pass
+async def process_files(
+    files_path: list[str],
+    output_dir: str,
+    agent: Agent,
+    session_service: InMemorySessionService,
+    app_name: str,
+    file_section: str,
+    concurrency: int = CONCURRENCY,
+    batch_size: int = 1,
+    batch_schema: type[BaseModel] | None = None,
+    batch_instruction: str = batch_model_instruction,
+    use_cache: bool = True,
+    preprocess: Callable[[str], str] | None = None,
+    postprocess: Callable[[dict], dict] | None = None,
+    output_schema: type[BaseModel] | None = None,
+    **process_kwargs,
+):
+    """
+    Runs process_file over all files with a single Runner and a TaskGroup of concurrency
+    workers fed through a bounded queue, so live tasks stay O(concurrency) and a slow
+    file never holds back the next ones.
+    With batch_size > 1, groups of files are sent together through process_batch, using
+    batch_schema/batch_instruction when the agent module defines its own.
+    Files that already have an output in output_dir are skipped, and files with
+    identical input text share one LLM call whose output is copied to the rest.
+    With use_cache, outputs are also stored by input hash under the agent name so
+    reruns over already seen texts skip the LLM; the key also covers the model,
+    instruction and output schema, so editing any of them invalidates the cache.
+    preprocess, when given, is applied to each input text before it is hashed or sent,
+    and postprocess to each LLM output before it is cached and written.
+    output_schema is for agents built without one (free-form JSON, no guided decoding):
+    single-file outputs are validated against it, and batches, also free-form, are
+    validated against its batch schema
+    """
+    cache_name = agent.name if use_cache else None
+    # taken from the single-file agent, so batched and unbatched runs share outputs
+    scope = cache_scope(agent, output_schema) if use_cache else ""
+    (Path(output_dir) / HASHES_DIR).mkdir(parents=True, exist_ok=True)
+    files_path = _pending_files(files_path, output_dir)
+    groups, contents = await asyncio.to_thread(
+        _group_by_content, files_path, file_section, preprocess
+    )
+    grouped = sum(map(len, groups))
+    if len(groups) < grouped:
+        print(f"Deduplicated {grouped - len(groups)} files with repeated input")
+    files_path = [group[0] for group in groups]
 
-        refreshed_state = await session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session.id
+    if batch_size > 1:
+        if agent.output_schema is None:
+            # free-form batch agent: its reply is validated against the batch schema
+            batch_schema = batch_schema or make_batch_schema(output_schema)
+            output_schema = batch_schema
+        agent = make_batch_agent(agent, batch_schema, batch_instruction, output_schema)
+        jobs = [
+            files_path[start : start + batch_size]
+            for start in range(0, len(files_path), batch_size)
+        ]
+    else:
+        jobs = files_path
+
+    use_shared_http_client(max_connections=concurrency)
+    warm_response_formats(agent)
+    runner = Runner(agent=agent, app_name=app_name, session_service=session_service)
+    sem = asyncio.Semaphore(concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    def _make_job(job):
+        if batch_size > 1:
+            return process_batch(
+                output_dir=output_dir,
+                runner=runner,
+                session_service=session_service,
+                app_name=app_name,
+                file_section=file_section,
+                files_batch=job,
+                sem=sem,
+                cache_name=cache_name,
+                cache_scope=scope,
+                preprocess=preprocess,
+                postprocess=postprocess,
+                contents=[contents.pop(fp) for fp in job],
+                output_schema=output_schema,
+                **process_kwargs,
+            )
+        return process_file(
+            output_dir=output_dir,
+            runner=runner,
+            session_service=session_service,
+            app_name=app_name,
+            file_section=file_section,
+            file_path=job,
+            sem=sem,
+            cache_name=cache_name,
+            cache_scope=scope,
+            preprocess=preprocess,
+            postprocess=postprocess,
+            output_schema=output_schema,
+            file_content=contents.pop(job),
+            **process_kwargs,
         )
-        filename_section = refreshed_state.state[output_key]
 
-        os.makedirs(output_dir, exist_ok=True)
-        out_path = os.path.join(output_dir, f"{os.path.basename(file_path)}.json")
-        with open(out_path, "w", encoding="utf-8") as fp:
-            json.dump(filename_section, fp, ensure_ascii=False, indent=4)
+    async def _worker():
+        while (job := await queue.get()) is not None:
+            try:
+                await _make_job(job)
+            except Exception as e:
+                print(f"Task failed: {e!r}")
 
-        print(f"Done: {out_path}")
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(concurrency):
+            tg.create_task(_worker())
+        for job in jobs:
+            await queue.put(job)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    _copy_duplicate_outputs(output_dir, groups)
@@ -1,18 +1,21 @@
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import os
-import json
+import orjson
 
 from google.adk.agents import Agent
 
+from ai_factory.agents.incidence_detector.utils import load_cv
+
 DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
 def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def _safe_get(d: Dict[str, Any], *keys, default=None):
@@ -26,6 +29,7 @@ def _safe_get(d: Dict[str, Any], *keys, default=None):
     return cur
 
 
+@lru_cache(maxsize=1024)
 def _weekday_from_base_folder(base_folder: str) -> str:
     date_str = base_folder[:10]
     try:
@@ -114,8 +118,8 @@ def _days_lag_utc(
 
 
 def _lag_mode_for_weekday(cv: Dict[str, Any], weekday: str) -> Optional[int]:
-    sched = _safe_get(
-        cv, "file_processing_pattern_section", "upload_schedule_by_day", default=[]
+    sched = (
+        _safe_get(cv, "file_processing_pattern_section", "upload_schedule_by_day") or []
     )
     for row in sched:
         if str(row.get("day")) == weekday:
@@ -130,8 +134,8 @@ def _lag_mode_for_weekday(cv: Dict[str, Any], weekday: str) -> Optional[int]:
 def _schedule_end_minutes_for_weekday(
     cv: Dict[str, Any], weekday: str
 ) -> Optional[int]:
-    sched = _safe_get(
-        cv, "file_processing_pattern_section", "upload_schedule_by_day", default=[]
+    sched = (
+        _safe_get(cv, "file_processing_pattern_section", "upload_schedule_by_day") or []
     )
     for row in sched:
         if str(row.get("day")) != weekday:
@@ -184,9 +188,7 @@ class UploadAfterScheduleDetectorAgent(Agent):
         records: List[Dict[str, Any]] = list(cleaned.get("inferred_batch", []))
 
         cv_path = f"custom_outputs/complete_sections/{rid}_native.md.json"
-        cv: Dict[str, Any] = {}
-        if os.path.exists(cv_path):
-            cv = _load_json(cv_path)
+        cv: Dict[str, Any] = load_cv(cv_path)
 
         anomalies: List[Dict[str, Any]] = []
         ok: List[Dict[str, Any]] = []
@@ -1,26 +1,46 @@
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import os
-import json
+import orjson
 
 from google.adk.agents import Agent
 
+from ai_factory.agents.incidence_detector.utils import cv_mtime_ns, load_cv_cached
+
 WEEKDAY = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
 def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
-def _to_utc_date(s: str) -> datetime:
+@lru_cache(maxsize=4096)
+def _parse_utc_date(s: str) -> Optional[datetime]:
+    # uploads of a batch share few timestamps; None (unparseable) is cached too
     try:
         if len(s) == 10 and s[4] == "-" and s[7] == "-":
             return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
-        return datetime.fromisoformat(s.replace("Z", "+00:00")).astimezone(timezone.utc)
+        if s.endswith("Z") and s.count("Z") == 1:
+            s = s[:-1] + "+00:00"
+        else:
+            s = s.replace("Z", "+00:00")
+        return datetime.fromisoformat(s).astimezone(timezone.utc)
     except Exception:
-        return datetime.now(timezone.utc)
+        return None
+
+
+def _to_utc_date(s: str) -> datetime:
+    try:
+        dt = _parse_utc_date(s)
+    except TypeError:  # unhashable input, not a timestamp either
+        dt = None
+    # "now" is never cached, so the fallback stays the time of the call
+    return dt if dt is not None else datetime.now(timezone.utc)
 
 
 def _weekday_name(d: datetime) -> str:
@@ -29,65 +49,68 @@ def _weekday_name(d: datetime) -> str:
 
 def _records_on_exec_day(
     records: List[Dict[str, Any]], exec_date: datetime
-) -> List[Dict[str, Any]]:
-    y, m, d = exec_date.year, exec_date.month, exec_date.day
-    out = []
+) -> Tuple[List[Dict[str, Any]], Counter]:
+    """
+    Keeps the records uploaded on exec_date (or without uploaded_at) and counts the
+    kept ones per entity in the same pass
+    """
+    key = (exec_date.year, exec_date.month, exec_date.day)
+    out: List[Dict[str, Any]] = []
+    counts: Counter = Counter()
     for r in records:
         ts = r.get("uploaded_at")
-        if not ts:
-            out.append(r)
-            continue
-        dt = _to_utc_date(ts)
-        if (dt.year, dt.month, dt.day) == (y, m, d):
-            out.append(r)
-    return out
-
-
-def _actual_counts_by_entity(records: List[Dict[str, Any]]) -> Dict[str, int]:
-    counts: Dict[str, int] = {}
-    for r in records:
+        if ts:
+            dt = _to_utc_date(ts)
+            if (dt.year, dt.month, dt.day) != key:
+                continue
+        out.append(r)
         e = str(r.get("entity") or "").strip()
         if e:
-            counts[e] = counts.get(e, 0) + 1
-    return counts
+            counts[e] += 1
+    return out, counts
 
 
-def _expected_from_cv_entity_weekday(
-    cv: Dict[str, Any], weekday: str
-) -> List[Dict[str, Any]]:
-    dsec = cv.get("day_of_week_section_pattern") or {}
-    rows = dsec.get("entity_weekday") or []
-    out = []
-    for it in rows:
-        if (it.get("day") or "").strip() != weekday:
-            continue
-        ent = str(it.get("entity") or "").strip()
-        mf = it.get("median_files")
-        if ent and mf is not None and float(mf) > 0:
-            out.append({"entity": ent, "median_files": int(round(float(mf)))})
-    return out
+@dataclass
+class CvWeekdayIndex:
+    # the CV's day-of-week rows keyed by weekday, built once per CV file
+    expected_by_wd: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    # rows.median of the first weekday row of each day (0.0 when not numeric)
+    rows_median_by_wd: Dict[str, float] = field(default_factory=dict)
+    has_entity_weekday: bool = False
 
 
-def _cv_has_entity_weekday(cv: Dict[str, Any]) -> bool:
+def _build_cv_index(cv: Dict[str, Any]) -> CvWeekdayIndex:
     dsec = cv.get("day_of_week_section_pattern") or {}
-    lst = dsec.get("entity_weekday") or []
-    return len(lst) > 0
+    entity_rows = dsec.get("entity_weekday") or []
+    index = CvWeekdayIndex(has_entity_weekday=len(entity_rows) > 0)
+    for it in entity_rows:
+        ent = str(it.get("entity") or "").strip()
+        mf = it.get("median_files")
+        # a non-numeric median_files row is skipped like a missing one
+        try:
+            mf = float(mf) if mf is not None else None
+        except (TypeError, ValueError):
+            mf = None
+        if ent and mf is not None and mf > 0:
+            day = (it.get("day") or "").strip()
+            index.expected_by_wd.setdefault(day, []).append(
+                {"entity": ent, "median_files": int(round(mf))}
+            )
+    for it in dsec.get("weekday") or []:
+        day = (it.get("day") or "").strip()
+        if day in index.rows_median_by_wd:
+            continue
+        med = (it.get("rows") or {}).get("median")
+        try:
+            index.rows_median_by_wd[day] = float(med) if med is not None else 0.0
+        except Exception:
+            index.rows_median_by_wd[day] = 0.0
+    return index
 
 
-def _cv_weekday_rows_median(cv: Dict[str, Any], weekday: str) -> Optional[float]:
-    dsec = cv.get("day_of_week_section_pattern") or {}
-    rows = dsec.get("weekday") or []
-    for it in rows:
-        if (it.get("day") or "").strip() == weekday:
-            rows_stats = it.get("rows") or {}
-            med = rows_stats.get("median")
-            if med is None:
-                return 0.0
-            try:
-                return float(med)
-            except Exception:
-                return 0.0
-    return None
+@lru_cache(maxsize=128)
+def _cv_index_cached(cv_path: str, mtime_ns: int) -> CvWeekdayIndex:
+    return _build_cv_index(load_cv_cached(cv_path, mtime_ns))
 
 
 def _cv_meta(cv: Dict[str, Any]) -> Dict[str, Optional[str]]:
@@ -125,10 +148,17 @@ class MissingFileDetectorSimple(Agent):
         weekday = _weekday_name(exec_date)
 
         today_blob = _load_json(today_path)
-        today_records = list((today_blob or {}).get("inferred_batch") or [])
-        today_records = _records_on_exec_day(today_records, exec_date)
+        today_records, actual_counts = _records_on_exec_day(
+            (today_blob or {}).get("inferred_batch") or [], exec_date
+        )
 
-        cv_blob = _load_json(cv_path) if os.path.exists(cv_path) else {}
+        cv_mtime = cv_mtime_ns(cv_path)
+        if cv_mtime is None:
+            cv_blob: Dict[str, Any] = {}
+            cv_index = _build_cv_index(cv_blob)
+        else:
+            cv_blob = load_cv_cached(cv_path, cv_mtime)
+            cv_index = _cv_index_cached(cv_path, cv_mtime)
         meta = _cv_meta(cv_blob)
 
         last_week_blob = (
@@ -146,14 +176,13 @@ class MissingFileDetectorSimple(Agent):
         anomalies: List[Dict[str, Any]] = []
         ok_files: List[Dict[str, Any]] = today_records[:]  # pass-through
 
-        if _cv_has_entity_weekday(cv_blob):
-            expected = _expected_from_cv_entity_weekday(cv_blob, weekday)
-            actual_counts = _actual_counts_by_entity(today_records)
+        if cv_index.has_entity_weekday:
+            expected = cv_index.expected_by_wd.get(weekday, [])
 
             for exp in expected:
                 ent = exp["entity"]
                 expected_cnt = int(exp["median_files"])
-                actual_cnt = int(actual_counts.get(ent, 0))
+                actual_cnt = actual_counts[ent]
                 if actual_cnt > 0:
                     continue
                 anomalies.append(
@@ -182,7 +211,7 @@ class MissingFileDetectorSimple(Agent):
                     }
                 )
         else:
-            med = _cv_weekday_rows_median(cv_blob, weekday)
+            med = cv_index.rows_median_by_wd.get(weekday)
             if med is not None and med > 0 and len(today_records) == 0:
                 anomalies.append(
                     {
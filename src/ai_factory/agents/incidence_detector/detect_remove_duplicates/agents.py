@@ -1,16 +1,51 @@
+import calendar
+from dataclasses import asdict, dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Dict, List, Tuple, Optional
 
 
 def _ts(s: Optional[str]) -> float:
     if not s:
         return 0.0
+    return _ts_str(str(s))
+
+
+@lru_cache(maxsize=8192)
+def _ts_str(s: str) -> float:
+    # fast path for the usual "YYYY-MM-DDTHH:MM:SS[.ffffff]Z" upload timestamps
+    n = len(s)
+    if (
+        (n == 20 or (n == 27 and s[19] == "."))
+        and s[-1] == "Z"
+        and s[4] == s[7] == "-"
+        and s[10] == "T"
+        and s[13] == s[16] == ":"
+    ):
+        digits = s[0:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:19] + s[20:26]
+        if digits.isascii() and digits.isdigit():
+            y, mo, d = int(s[0:4]), int(s[5:7]), int(s[8:10])
+            h, mi, sec = int(s[11:13]), int(s[14:16]), int(s[17:19])
+            micros = int(s[20:26]) if n == 27 else 0
+            if y and 1 <= mo <= 12 and 1 <= d <= 28 and h < 24 and mi < 60 and sec < 60:
+                epoch = calendar.timegm((y, mo, d, h, mi, sec, 0, 0, 0))
+                return epoch + micros / 1e6
+    # anything else (offsets, naive times, days 29-31 that need a calendar check)
     try:
-        return datetime.fromisoformat(str(s).replace("Z", "+00:00")).timestamp()
+        return datetime.fromisoformat(s.replace("Z", "+00:00")).timestamp()
     except Exception:
         return 0.0
 
 
+@dataclass(slots=True, frozen=True)
+class DedupeStats:
+    total_records: int
+    duplicate_groups: int
+    final_count: int
+    removed_count: int
+    harmless_count: int
+
+
 def _status_is_processed(r: Dict[str, Any]) -> bool:
     return str(r.get("status", "")).strip().lower() == "processed"
 
@@ -19,28 +54,27 @@ def _status_text(r: Dict[str, Any]) -> str:
     return str(r.get("status", "")).strip().lower()
 
 
-def _choose_keeper(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+def _choose_keeper(
+    pairs: List[Tuple[int, Dict[str, Any]]],
+) -> Tuple[int, Dict[str, Any]]:
+    # pairs are (record index, record); returns the keeper with its index
     # Prefer: rows (desc) -> file_size (desc) -> uploaded_at (most recent)
     return max(
-        items,
-        key=lambda it: (
-            int(it.get("rows") or 0),
-            float(it.get("file_size") or 0.0),
-            _ts(it.get("uploaded_at")),
+        pairs,
+        key=lambda pair: (
+            int(pair[1].get("rows") or 0),
+            float(pair[1].get("file_size") or 0.0),
+            _ts(pair[1].get("uploaded_at")),
         ),
     )
 
 
-def _group_by(
-    records: List[Dict[str, Any]], key_fn
-) -> Dict[Tuple[Any, ...], List[int]]:
-    buckets: Dict[Tuple[Any, ...], List[int]] = {}
-    for i, r in enumerate(records):
-        k = key_fn(r)
-        if k is None:
-            continue
-        buckets.setdefault(k, []).append(i)
-    return buckets
+def _ck_key(r: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    cf = r.get("cleaned_filename")
+    if not cf:
+        return None
+    b = r.get("batch") or ""
+    return (cf, b)
 
 
 def _removed_reason(item: Dict[str, Any]) -> Tuple[str, str]:
@@ -94,88 +128,93 @@ def dedupe_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
         "harmless": [non-keepers from groups with exactly 1 processed]
       }
     """
-    # Pass 1: exact filename
-    by_filename = _group_by(
-        records, lambda r: (r["filename"],) if "filename" in r else None
-    )
-
-    grouped = set()
+    # One pass over the records buckets them by both keys at once and keeps the
+    # processed flag in a parallel list, so no field is read twice further down
+    by_filename: Dict[Tuple[Any, ...], List[int]] = {}
+    by_ck: Dict[Tuple[Any, ...], List[int]] = {}
+    processed_mask: List[bool] = []
+    for i, r in enumerate(records):
+        if "filename" in r:
+            by_filename.setdefault((r["filename"],), []).append(i)
+        ck = _ck_key(r)
+        if ck is not None:
+            by_ck.setdefault(ck, []).append(i)
+        processed_mask.append(_status_is_processed(r))
+
+    # one byte per record, 1 once it belongs to a duplicate group
+    grouped = bytearray(len(records))
     dup_groups: List[Dict[str, Any]] = []
 
+    # exact filename groups take precedence
     for k, idxs in by_filename.items():
         if len(idxs) > 1:
             dup_groups.append({"key_type": "filename", "key_value": k, "idxs": idxs})
-            grouped.update(idxs)
-
-    # Pass 2: (cleaned_filename, batch)
-    remaining_indices = [i for i in range(len(records)) if i not in grouped]
-
-    def ck_key(r):
-        cf = r.get("cleaned_filename")
-        if not cf:
-            return None
-        b = r.get("batch") or ""
-        return (cf, b)
-
-    by_ck_local = _group_by([records[i] for i in remaining_indices], ck_key)
-
-    for k, local_idxs in by_ck_local.items():
-        if len(local_idxs) > 1:
-            real_idxs = [remaining_indices[j] for j in local_idxs]
-            dup_groups.append(
-                {
-                    "key_type": "cleaned_filename+batch",
-                    "key_value": k,
-                    "idxs": real_idxs,
-                }
-            )
-            grouped.update(real_idxs)
+            for i in idxs:
+                grouped[i] = 1
+
+    # (cleaned_filename, batch) groups over the records left ungrouped. Sorting on
+    # the first remaining index restores the order a second scan would produce
+    ck_groups = []
+    for k, idxs in by_ck.items():
+        if len(idxs) > 1:
+            left = [i for i in idxs if not grouped[i]]
+            if len(left) > 1:
+                ck_groups.append((k, left))
+    ck_groups.sort(key=lambda kv: kv[1][0])
+
+    for k, idxs in ck_groups:
+        dup_groups.append(
+            {
+                "key_type": "cleaned_filename+batch",
+                "key_value": k,
+                "idxs": idxs,
+            }
+        )
+        for i in idxs:
+            grouped[i] = 1
 
     final: List[Dict[str, Any]] = []
     removed: List[Dict[str, Any]] = []
     harmless: List[Dict[str, Any]] = []
 
-    non_dup_indices = [i for i in range(len(records)) if i not in grouped]
-    final.extend(records[i] for i in non_dup_indices)
+    final.extend(r for r, g in zip(records, grouped) if not g)
 
     for g in dup_groups:
-        items = [records[i] for i in g["idxs"]]
-        processed = [it for it in items if _status_is_processed(it)]
+        idxs = g["idxs"]
+        # a record joins at most one group, so each keeper sort key is parsed once
+        processed = [(i, records[i]) for i in idxs if processed_mask[i]]
 
         if len(processed) == 0:
             reason = "no_processed (no keeper selected)"
-            for it in items:
-                r = dict(it)
-                r["dedupe_reason"] = reason
-                removed.append(r)
+            removed.extend({**records[i], "dedupe_reason": reason} for i in idxs)
 
         elif len(processed) > 1:
-            keeper = _choose_keeper(processed)
+            keeper_i, keeper = _choose_keeper(processed)
             final.append(keeper)
             reason = f"multi_processed (keeper={keeper.get('filename')})"
-            for it in items:
-                if it is keeper:
-                    continue
-                r = dict(it)
-                r["dedupe_reason"] = reason
-                removed.append(r)
+            removed.extend(
+                {**records[i], "dedupe_reason": reason} for i in idxs if i != keeper_i
+            )
 
         else:
-            keeper = processed[0]
+            keeper_i, keeper = processed[0]
             final.append(keeper)
-            for it in items:
-                if it is keeper:
-                    continue
-                harmless.append(dict(it))
-
-    stats = {
-        "total_records": len(records),
-        "duplicate_groups": len(dup_groups),
-        "final_count": len(final),
-        "removed_count": len(removed),
-        "harmless_count": len(harmless),
+            # harmless rows are only serialized, the record itself can be shared
+            harmless.extend(records[i] for i in idxs if i != keeper_i)
+
+    stats = DedupeStats(
+        total_records=len(records),
+        duplicate_groups=len(dup_groups),
+        final_count=len(final),
+        removed_count=len(removed),
+        harmless_count=len(harmless),
+    )
+    return {
+        "stats": asdict(stats),
+        "final": final,
+        "removed": removed,
+        "harmless": harmless,
     }
-    return {"stats": stats, "final": final, "removed": removed, "harmless": harmless}
 
 
 def compute_dedupe_and_status_anomalies(
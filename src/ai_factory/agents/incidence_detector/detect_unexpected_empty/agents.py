@@ -1,18 +1,23 @@
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import os
-import json
+import orjson
 
 from google.adk.agents import Agent
 
+from ai_factory.agents.incidence_detector.utils import cv_mtime_ns, load_cv_cached
+
 DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+EMPTY_STATUSES = frozenset({"empty", "no_data"})
 
 
 def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def _safe_get(d: Dict[str, Any], *keys, default=None):
@@ -26,6 +31,7 @@ def _safe_get(d: Dict[str, Any], *keys, default=None):
     return cur
 
 
+@lru_cache(maxsize=1024)
 def _weekday_from_base_folder(base_folder: str) -> str:
     date_str = base_folder[:10]
     try:
@@ -41,6 +47,7 @@ def _resource_id_from_stem(stem: str) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=1024)
 def _weekday_from_iso_date(date_str: str) -> Optional[str]:
     try:
         dt = datetime.strptime(date_str[:10], "%Y-%m-%d")
@@ -65,77 +72,36 @@ def _weekday_for_record(r: Dict[str, Any], folder_weekday: str) -> str:
     return folder_weekday
 
 
-def _cv_expected_zero_global_weekday(
-    cv: Dict[str, Any], weekday: str
-) -> Optional[bool]:
-    per = _safe_get(cv, "volume_characteristics_section", "per_weekday", default=[])
-    for row in per:
-        if str(row.get("day")) == weekday:
-            emp = row.get("empty_files")
-            if not isinstance(emp, dict) or not emp:
-                return None
-            saw_any_key = False
-            for k in ("mean", "median", "mode", "max"):
-                if k in emp:
-                    saw_any_key = True
-                    try:
-                        if emp[k] is not None and float(emp[k]) > 0:
-                            return True
-                    except Exception:
-                        pass
-            if saw_any_key:
-                return False
-            return None
-    return None
-
-
-def _cv_expected_zero_entity_weekday(
-    cv: Dict[str, Any], entity: str, weekday: str
-) -> Optional[bool]:
-    ent_rows = _safe_get(
-        cv, "day_of_week_section_pattern", "entity_weekday", default=[]
-    )
-    for row in ent_rows:
-        if str(row.get("entity")) == entity and str(row.get("day")) == weekday:
-            me = row.get("median_empty")
+def _empty_stats_expected(emp: Any, keys: tuple) -> Optional[bool]:
+    # True if any of keys is > 0, False if some key is present but none is > 0,
+    # None when the stat block is missing or carries none of the keys
+    if not isinstance(emp, dict) or not emp:
+        return None
+    saw_any_key = False
+    for k in keys:
+        if k in emp:
+            saw_any_key = True
             try:
-                if me is None:
-                    return None
-                return float(me) > 0
+                if emp[k] is not None and float(emp[k]) > 0:
+                    return True
             except Exception:
-                return None
+                pass
+    if saw_any_key:
+        return False
     return None
 
 
-def _cv_expected_zero_weekday_section4(
-    cv: Dict[str, Any], weekday: str
-) -> Optional[bool]:
-    wk = _safe_get(cv, "day_of_week_section_pattern", "weekday", default=[])
-    for row in wk:
-        if str(row.get("day")) != weekday:
-            continue
-        emp = row.get("empty_files")
-        if not isinstance(emp, dict) or not emp:
+def _median_empty_expected(me: Any) -> Optional[bool]:
+    try:
+        if me is None:
             return None
-        saw_any_key = False
-        for k in ("min", "mean", "median", "mode", "max"):
-            if k in emp:
-                saw_any_key = True
-                try:
-                    if emp[k] is not None and float(emp[k]) > 0:
-                        return True
-                except Exception:
-                    pass
-        if saw_any_key:
-            return False
+        return float(me) > 0
+    except Exception:
         return None
-    return None
 
 
 def _cv_global_empty_expected_section2(cv: Dict[str, Any]) -> Optional[bool]:
-    pct = _safe_get(
-        cv, "file_processing_pattern_section", "status_percentages", default={}
-    )
+    pct = _safe_get(cv, "file_processing_pattern_section", "status_percentages") or {}
     for k in ("empty", "empties", "empty_files"):
         if k in pct:
             try:
@@ -145,33 +111,84 @@ def _cv_global_empty_expected_section2(cv: Dict[str, Any]) -> Optional[bool]:
     return None
 
 
-def _is_zero_expected(cv: Dict[str, Any], entity: str, weekday: str) -> bool:
-    ent = _cv_expected_zero_entity_weekday(cv, entity, weekday)
-    if ent is not None:
-        return ent
-    wk4 = _cv_expected_zero_weekday_section4(cv, weekday)
-    if wk4 is not None:
-        return wk4
-    glob = _cv_expected_zero_global_weekday(cv, weekday)
-    if glob is not None:
-        return glob
-    glob2 = _cv_global_empty_expected_section2(cv)
-    if glob2 is not None:
-        return glob2
+@dataclass
+class CvEmptyIndex:
+    # expected-empty answers of the CV, keyed for O(1) lookup per record.
+    # The first row of each key wins, like the linear scans this replaces
+    entity_wd: Dict[Tuple[str, str], Optional[bool]] = field(default_factory=dict)
+    wd4: Dict[str, Optional[bool]] = field(default_factory=dict)
+    wd3: Dict[str, Optional[bool]] = field(default_factory=dict)
+    global_pct: Optional[bool] = None
+
+
+@dataclass(slots=True, frozen=True)
+class EmptyStats:
+    total_records: int
+    empty_candidates: int
+    expected_empty: int
+    unexpected_empty: int
+
+
+def _build_cv_index(cv: Dict[str, Any]) -> CvEmptyIndex:
+    """
+    Walks each CV weekday list once: entity x weekday medians and weekday empty-file
+    stats (day-of-week section), weekday empty-file stats (volume section), plus the
+    global empty percentage of the processing section
+    """
+    index = CvEmptyIndex(global_pct=_cv_global_empty_expected_section2(cv))
+    dow = _safe_get(cv, "day_of_week_section_pattern", default={})
+    volume = _safe_get(cv, "volume_characteristics_section", default={})
+    for row in _safe_get(dow, "entity_weekday") or []:
+        key = (str(row.get("entity")), str(row.get("day")))
+        if key not in index.entity_wd:
+            index.entity_wd[key] = _median_empty_expected(row.get("median_empty"))
+    for row in _safe_get(dow, "weekday") or []:
+        day = str(row.get("day"))
+        if day not in index.wd4:
+            index.wd4[day] = _empty_stats_expected(
+                row.get("empty_files"), ("min", "mean", "median", "mode", "max")
+            )
+    for row in _safe_get(volume, "per_weekday") or []:
+        day = str(row.get("day"))
+        if day not in index.wd3:
+            index.wd3[day] = _empty_stats_expected(
+                row.get("empty_files"), ("mean", "median", "mode", "max")
+            )
+    return index
+
+
+@lru_cache(maxsize=128)
+def _cv_index_cached(cv_path: str, mtime_ns: int) -> CvEmptyIndex:
+    return _build_cv_index(load_cv_cached(cv_path, mtime_ns))
+
+
+def _is_zero_expected(index: CvEmptyIndex, entity: str, weekday: str) -> bool:
+    for expected in (
+        index.entity_wd.get((entity, weekday)),
+        index.wd4.get(weekday),
+        index.wd3.get(weekday),
+        index.global_pct,
+    ):
+        if expected is not None:
+            return expected
     return False
 
 
 def _is_empty_candidate(r: Dict[str, Any]) -> bool:
     rows = r.get("rows")
-    status = str(r.get("status") or "").strip().lower()
-    try:
-        if rows is not None and int(rows) == 0:
+    # cleaned records carry int rows, so the common case needs no int() / try
+    if type(rows) is int:
+        if rows == 0:
             return True
-    except Exception:
-        pass
-    if status in {"empty", "no_data"}:
-        return True
-    return False
+    elif rows is not None:
+        try:
+            if int(rows) == 0:
+                return True
+        except Exception:
+            pass
+    # the status is only normalized for records that are not already rows == 0
+    status = r.get("status")
+    return bool(status) and str(status).strip().lower() in EMPTY_STATUSES
 
 
 class UnexpectedEmptyDetectorAgent(Agent):
@@ -201,9 +218,7 @@ class UnexpectedEmptyDetectorAgent(Agent):
         records: List[Dict[str, Any]] = list(cleaned.get("inferred_batch", []))
 
         cv_path = f"custom_outputs/complete_sections/{rid}_native.md.json"
-        cv: Dict[str, Any] = {}
-        if os.path.exists(cv_path):
-            cv = _load_json(cv_path)
+        cv_mtime = cv_mtime_ns(cv_path)
 
         anomalies: List[Dict[str, Any]] = []
         ok: List[Dict[str, Any]] = []
@@ -215,14 +230,27 @@ class UnexpectedEmptyDetectorAgent(Agent):
             else:
                 ok.append(r)
 
+        # healthy batches have no candidates, the CV is then never parsed
+        cv_index = (
+            _cv_index_cached(cv_path, cv_mtime)
+            if candidates and cv_mtime is not None
+            else _build_cv_index({})
+        )
         unexpected_by_entity: Dict[str, int] = {}
+        # entity x weekday has low cardinality, the lookup ladder runs once per pair
+        expected_by_key: Dict[Tuple[str, str], bool] = {}
+        anomaly_entities: List[str] = []
         expected_count = 0
         unexpected_count = 0
 
         for r in candidates:
             entity = str(r.get("entity") or "")
             rec_weekday = _weekday_for_record(r, weekday)
-            expected_zero = _is_zero_expected(cv, entity, rec_weekday)
+            key = (entity, rec_weekday)
+            expected_zero = expected_by_key.get(key)
+            if expected_zero is None:
+                expected_zero = _is_zero_expected(cv_index, entity, rec_weekday)
+                expected_by_key[key] = expected_zero
 
             if expected_zero:
                 expected_count += 1
@@ -231,6 +259,7 @@ class UnexpectedEmptyDetectorAgent(Agent):
 
             unexpected_count += 1
             unexpected_by_entity[entity] = unexpected_by_entity.get(entity, 0) + 1
+            anomaly_entities.append(entity)
 
             anomalies.append(
                 {
@@ -242,23 +271,22 @@ class UnexpectedEmptyDetectorAgent(Agent):
                 }
             )
 
-        for item in anomalies:
-            ent = str(item.get("entity") or "")
-            if unexpected_by_entity.get(ent, 0) > self.urgent_entity_count_threshold:
+        for item, ent in zip(anomalies, anomaly_entities):
+            if unexpected_by_entity[ent] > self.urgent_entity_count_threshold:
                 item["severity"] = "urgent"
 
-        stats = {
-            "total_records": len(records),
-            "empty_candidates": len(candidates),
-            "expected_empty": expected_count,
-            "unexpected_empty": unexpected_count,
-        }
+        stats = EmptyStats(
+            total_records=len(records),
+            empty_candidates=len(candidates),
+            expected_empty=expected_count,
+            unexpected_empty=unexpected_count,
+        )
 
         return {
-            "stats": stats,
+            "stats": asdict(stats),
             "ok": ok,
             "anomalies": anomalies,
             "weekday_utc": weekday,
             "resource_id": rid,
-            "cv_path": cv_path if os.path.exists(cv_path) else None,
+            "cv_path": cv_path if cv_mtime is not None else None,
         }
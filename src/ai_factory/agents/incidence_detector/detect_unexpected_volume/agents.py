@@ -1,5 +1,6 @@
 from datetime import datetime
-import json
+from functools import lru_cache
+import orjson
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -7,12 +8,14 @@ from typing import Any, Dict, List, Optional, Tuple
 
 from google.adk.agents import Agent
 
+from ai_factory.agents.incidence_detector.utils import load_cv
+
 DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
 def _load_json(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def _safe_get(d: Dict[str, Any], *keys, default=None):
@@ -26,6 +29,7 @@ def _safe_get(d: Dict[str, Any], *keys, default=None):
     return cur
 
 
+@lru_cache(maxsize=1024)
 def _weekday_from_base_folder(base_folder: str) -> str:
     date_str = base_folder[:10]
     try:
@@ -35,6 +39,7 @@ def _weekday_from_base_folder(base_folder: str) -> str:
         return "Tue"
 
 
+@lru_cache(maxsize=1024)
 def _weekday_from_iso_date(date_str: str) -> Optional[str]:
     try:
         dt = datetime.strptime(date_str[:10], "%Y-%m-%d")
@@ -141,10 +146,9 @@ def _weekday_row_median_from_section3(
     cv: Dict[str, Any], weekday: str
 ) -> Optional[float]:
     v3 = _safe_get(cv, "volume_characteristics_section", default={})
-    for row in _safe_get(v3, "per_weekday", default=[]):
+    for row in _safe_get(v3, "per_weekday") or []:
         if str(row.get("day")) == weekday:
-            rows_block = row.get("rows") or {}
-            md = rows_block.get("median")
+            md = _safe_get(row, "rows", "median")
             try:
                 return float(md) if md is not None else None
             except Exception:
@@ -169,10 +173,8 @@ def _expected_band_from_section3(
     if not isinstance(v3, dict):
         return None
 
-    per_weekday_present = bool(
-        _safe_get(v3, "presence", "per_weekday_present", default=False)
-    )
-    overall_present = bool(_safe_get(v3, "presence", "overall_present", default=False))
+    per_weekday_present = bool(_safe_get(v3, "presence", "per_weekday_present"))
+    overall_present = bool(_safe_get(v3, "presence", "overall_present"))
 
     if per_weekday_present and weekday:
         if current_perfile_median and current_perfile_median > 0:
@@ -185,7 +187,7 @@ def _expected_band_from_section3(
                     ):
                         pass  # looks like daily totals → ignore
                     else:
-                        for row in _safe_get(v3, "per_weekday", default=[]):
+                        for row in _safe_get(v3, "per_weekday") or []:
                             if str(row.get("day")) == weekday:
                                 band = _band_from_rows_minmax_median(
                                     row.get("rows") or {}
@@ -196,7 +198,7 @@ def _expected_band_from_section3(
                 except Exception:
                     pass
         else:
-            for row in _safe_get(v3, "per_weekday", default=[]):
+            for row in _safe_get(v3, "per_weekday") or []:
                 if str(row.get("day")) == weekday:
                     band = _band_from_rows_minmax_median(row.get("rows") or {})
                     if band is not None:
@@ -204,16 +206,13 @@ def _expected_band_from_section3(
                     break
 
     if overall_present:
-        overall = _safe_get(v3, "overall", default={})
-        band = _band_from_rows_minmax_median(overall.get("rows_stats") or {})
+        rs = _safe_get(v3, "overall", "rows_stats")
+        band = _band_from_rows_minmax_median(rs)
         if band is not None:
             return band
 
-        median_val = None
-        rs = overall.get("rows_stats") or {}
-        if isinstance(rs, dict):
-            median_val = rs.get("median")
-        band = _band_from_normal_95(overall.get("normal_95") or {}, median_val)
+        median_val = _safe_get(rs, "median")
+        band = _band_from_normal_95(_safe_get(v3, "overall", "normal_95"), median_val)
         if band is not None:
             return band
 
@@ -246,9 +245,7 @@ class UnexpectedVolumeVariationAgent(Agent):
         records: List[Dict[str, Any]] = list(cleaned.get("inferred_batch", []))
 
         cv_path = f"custom_outputs/complete_sections/{rid}_native.md.json"
-        cv: Dict[str, Any] = {}
-        if os.path.exists(cv_path):
-            cv = _load_json(cv_path)
+        cv: Dict[str, Any] = load_cv(cv_path)
 
         current_median = _current_nonzero_rows_median(records)
         overall_band = _expected_band_from_section3(
@@ -260,9 +257,7 @@ class UnexpectedVolumeVariationAgent(Agent):
         candidates_judged = 0
 
         v3 = _safe_get(cv, "volume_characteristics_section", default={})
-        per_weekday_present = bool(
-            _safe_get(v3, "presence", "per_weekday_present", default=False)
-        )
+        per_weekday_present = bool(_safe_get(v3, "presence", "per_weekday_present"))
 
         for r in records:
             rows_val = r.get("rows")
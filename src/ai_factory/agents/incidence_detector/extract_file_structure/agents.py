@@ -1,33 +1,48 @@
-import json
+import orjson
 import os
-from typing import List, Dict, Any
+from itertools import chain, repeat
+from typing import List, Dict, Any, Optional
 
 import asyncio
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
-from google.genai import types
 
 from ai_factory.agents.incidence_detector.extract_file_structure.schemas import (
     InferredBatchOutput,
 )
+from ai_factory.agents.incidence_detector.extract_file_structure.tools import (
+    try_local_infer,
+)
 from ai_factory.agents.incidence_detector.extract_file_structure.prompts import (
     model_instruction,
     model_description,
 )
 
+from ai_factory.agents.cv_extracter.cache import cache_scope, get_cached, put_cached
+from ai_factory.agents.incidence_detector.utils import (
+    cv_mtime_ns,
+    load_cv_cached,
+    write_records,
+)
 from ai_factory.config import config
+from ai_factory.utils import make_lite_llm, make_user_content, run_main
 
 target_model = config.default_model
 model_name = "file_formatter_agent"
 output_key = "file_formatted"
-CONCURRENCY = 1
+# CVs in flight; every LLM call, whatever its CV, also goes through _llm_sem so the
+# provider sees at most LLM_CONCURRENCY requests at once
+CONCURRENCY = int(os.getenv("FILE_STRUCTURE_CONCURRENCY", "8"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "35"))
+_llm_sem = asyncio.Semaphore(LLM_CONCURRENCY)
+# FILE_STRUCTURE_LLM_CACHE=0 forces fresh LLM calls for every batch
+USE_LLM_CACHE = os.getenv("FILE_STRUCTURE_LLM_CACHE", "1") != "0"
 
 
 def make_extract_file_structure_agent() -> Agent:
     return Agent(
-        model=LiteLlm(model=target_model),
+        model=make_lite_llm(target_model, model_instruction),
         name=model_name,
         instruction=model_instruction,
         description=model_description,
@@ -36,23 +51,34 @@ def make_extract_file_structure_agent() -> Agent:
     )
 
 
-extract_file_structure_agent = make_extract_file_structure_agent()
+_STATUS_MAP = {
+    "processed": "processed",
+    "success": "processed",
+    "ok": "processed",
+    "failed": "failed",
+    "error": "failed",
+    "empty": "empty",
+    "unknown": "unknown",
+}
+_STATUS_CANON = frozenset(_STATUS_MAP.values())
 
 
 def _normalize_status(s):
     if not s:
         return None
-    s = str(s).strip().lower()
-    m = {
-        "processed": "processed",
-        "success": "processed",
-        "ok": "processed",
-        "failed": "failed",
-        "error": "failed",
-        "empty": "empty",
-        "unknown": "unknown",
-    }
-    return m.get(s, None)
+    if type(s) is str:
+        # already canonical values (the usual case) skip strip/lower entirely
+        if s in _STATUS_CANON:
+            return s
+        s = s.strip().lower()
+    else:
+        s = str(s).strip().lower()
+    return _STATUS_MAP.get(s)
+
+
+def _load_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def _infer_ext(fn: str):
@@ -67,6 +93,13 @@ def chunk(lst: List[Any], n: int):
         yield lst[i : i + n]
 
 
+def _rules_json(filename_pattern_section: Dict[str, Any]) -> bytes:
+    rules_obj = filename_pattern_section.get(
+        "filename_pattern_section", filename_pattern_section
+    )
+    return orjson.dumps(rules_obj, option=orjson.OPT_SORT_KEYS)
+
+
 async def run_single_batch(
     *,
     app_name: str,
@@ -78,39 +111,64 @@ async def run_single_batch(
     files_batch: List[Dict[str, Any]],
     output_key: str,
     enforce_stateless: bool = True,
+    use_cache: bool = USE_LLM_CACHE,
+    rules_json: Optional[bytes] = None,
+    runner: Optional[Runner] = None,
 ) -> Dict[str, Any]:
-    svc = InMemorySessionService() if enforce_stateless else session_service
-
-    session = await svc.create_session(app_name=app_name, user_id=user_id)
-    runner = Runner(agent=agent, app_name=app_name, session_service=svc)
-
-    rules_obj = filename_pattern_section.get(
-        "filename_pattern_section", filename_pattern_section
-    )
-
+    if rules_json is None:
+        rules_json = _rules_json(filename_pattern_section)
     slim_files = [
         {"filename": f.get("filename"), "status": f.get("status")} for f in files_batch
     ]
 
-    input_json = {
-        "datasource_id": datasource_id,
-        "context": {"filename_pattern_section": rules_obj},
-        "files": slim_files,
-    }
+    # byte-for-byte orjson.dumps(input, OPT_SORT_KEYS) of
+    # {"datasource_id", "context": {"filename_pattern_section": rules}, "files"},
+    # with the CV rules spliced in pre-serialized. The same text is the prompt and
+    # (with the agent scope) the cache key
+    payload = (
+        b'{"context":{"filename_pattern_section":'
+        + rules_json
+        + b'},"datasource_id":'
+        + orjson.dumps(datasource_id)
+        + b',"files":'
+        + orjson.dumps(slim_files, option=orjson.OPT_SORT_KEYS)
+        + b"}"
+    ).decode()
+
+    scope = None
+    if use_cache:
+        # same model + prompt + rules + files always map to the same inference
+        scope = cache_scope(agent)
+        cached = await asyncio.to_thread(get_cached, agent.name, payload, scope)
+        if cached is not None:
+            return cached
+
+    if runner is None:
+        svc = InMemorySessionService() if enforce_stateless else session_service
+        runner = Runner(agent=agent, app_name=app_name, session_service=svc)
+    # a fresh session per batch keeps batches stateless on a shared runner
+    svc = runner.session_service
+    session = await svc.create_session(app_name=app_name, user_id=user_id)
 
-    new_message = types.Content(
-        role="user", parts=[types.Part(text=json.dumps(input_json))]
-    )
+    new_message = make_user_content(payload)
 
-    async for _ in runner.run_async(
-        user_id=user_id, session_id=session.id, new_message=new_message
-    ):
-        pass
+    try:
+        # single LlmAgent: its output_key is in state once the final response arrives
+        async with _llm_sem:
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session.id, new_message=new_message
+            ):
+                if event.is_final_response():
+                    break
 
-    refreshed = await svc.get_session(
-        app_name=app_name, user_id=user_id, session_id=session.id
-    )
-    result = refreshed.state.get(output_key)
+        refreshed = await svc.get_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
+        result = refreshed.state.get(output_key)
+    finally:
+        await svc.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
 
     # If ADK returns a Pydantic model instance, convert to dict
     if hasattr(result, "model_dump"):
@@ -118,6 +176,9 @@ async def run_single_batch(
 
     # Expect {"inferred_batch": [...]}
     if isinstance(result, dict) and "inferred_batch" in result:
+        # only complete batches are kept, a short answer is retried next run
+        if scope and len(result["inferred_batch"]) == len(files_batch):
+            await asyncio.to_thread(put_cached, agent.name, payload, result, scope)
         return result
 
     return {"inferred_batch": []}
@@ -134,16 +195,41 @@ async def process_file_batched(
     files_all: List[Dict[str, Any]],
     batch_size: int = 40,
     batch_concurrency: int = 4,
+    use_local_rules: bool = True,
 ) -> Dict[str, Any]:
-    total = len(files_all)
+    # files the CV filename patterns resolve on their own never reach the LLM
+    rules_obj = filename_pattern_section.get(
+        "filename_pattern_section", filename_pattern_section
+    )
+    resolved: List[Optional[Dict[str, Any]]] = [
+        try_local_infer(rules_obj, f.get("filename")) if use_local_rules else None
+        for f in files_all
+    ]
+    llm_idxs = [i for i, inf in enumerate(resolved) if inf is None]
+    if len(llm_idxs) < len(files_all):
+        print(
+            f"[INFO] {datasource_id}: {len(files_all) - len(llm_idxs)} files "
+            "inferred from filename patterns"
+        )
+    files_llm = [files_all[i] for i in llm_idxs]
+    # every batch of the CV embeds the same rules, serialized here once, and runs
+    # on one Runner over a per-CV session service (each batch gets its own session)
+    rules_json = _rules_json(filename_pattern_section)
+    runner = Runner(
+        agent=agent, app_name=app_name, session_service=InMemorySessionService()
+    )
+
+    total = len(files_llm)
     batches = [
-        (start, files_all[start : start + batch_size])
+        (start, files_llm[start : start + batch_size])
         for start in range(0, total, batch_size)
     ]
 
     sem_batches = asyncio.Semaphore(batch_concurrency)
+    done_count = 0
 
     async def run_one(start_idx: int, files_batch: List[Dict[str, Any]]):
+        nonlocal done_count
         async with sem_batches:
             inferred = await run_single_batch(
                 app_name=app_name,
@@ -155,6 +241,8 @@ async def process_file_batched(
                 files_batch=files_batch,
                 output_key=output_key,
                 enforce_stateless=True,
+                rules_json=rules_json,
+                runner=runner,
             )
             items = inferred.get("inferred_batch", [])
             if len(items) != len(files_batch):
@@ -163,31 +251,24 @@ async def process_file_batched(
                 )
             else:
                 print(f"[INFO] Batch {start_idx}: {len(items)} items")
-            return (start_idx, items)
-
-    tasks = [asyncio.create_task(run_one(start, batch)) for (start, batch) in batches]
-
-    merged_items: List[Dict[str, Any]] = []
-    done_count = 0
-    results: List[tuple[int, List[Dict[str, Any]]]] = []
+            done_count += len(items)
+            print(f"[INFO] Progress: {done_count}/{total}")
+            return items
 
-    for coro in asyncio.as_completed(tasks):
-        start_idx, items = await coro
-        results.append((start_idx, items))
-        done_count += len(items)
-        print(f"[INFO] Progress: {done_count}/{total}")
+    # gather keeps submission order; LLM items go back to their files' positions,
+    # a short batch leaves {} for its unanswered files
+    results = await asyncio.gather(*(run_one(start, batch) for start, batch in batches))
 
-    # deterministic order
-    results.sort(key=lambda t: t[0])
-    for _, items in results:
-        merged_items.extend(items)
+    for (start, files_batch), items in zip(batches, results):
+        for k, item in enumerate(items[: len(files_batch)]):
+            resolved[llm_idxs[start + k]] = item
 
-    return {"inferred_batch": merged_items}
+    return {"inferred_batch": [inf if inf is not None else {} for inf in resolved]}
 
 
 async def process_one_cv(
     cv_to_check: str,
-    dataset_day_filepath: str,
+    files_for_cv: List[Dict[str, Any]],
     output_dir: str,
     output_key: str,
     agent: Agent,
@@ -198,15 +279,17 @@ async def process_one_cv(
     batch_size: int = 20,
 ):
     async with sem:
-        # Load files mapped by CV id
-        with open(dataset_day_filepath, "r", encoding="utf-8") as f:
-            dataset_day_json = json.load(f)[cv_to_check]  # List[files]
-
+        # disk I/O runs off the loop so other CVs' LLM calls keep moving
         cv_extracted_json_filepath = (
             f"custom_outputs/complete_sections/{cv_to_check}_native.md.json"
         )
-        with open(cv_extracted_json_filepath, "r", encoding="utf-8") as f:
-            cv_json_extracted = json.load(f)
+        # parsed once per CV for the whole day sweep, re-read only if the file changes
+        cv_mtime = cv_mtime_ns(cv_extracted_json_filepath)
+        if cv_mtime is None:
+            raise FileNotFoundError(cv_extracted_json_filepath)
+        cv_json_extracted = await asyncio.to_thread(
+            load_cv_cached, cv_extracted_json_filepath, cv_mtime
+        )
 
         # Accept either wrapped or flat structure
         filename_pattern_json = cv_json_extracted.get(
@@ -221,44 +304,43 @@ async def process_one_cv(
             user_id=user_id,
             datasource_id=cv_to_check,
             filename_pattern_section=filename_pattern_json,
-            files_all=dataset_day_json,
+            files_all=files_for_cv,
             batch_size=batch_size,
             batch_concurrency=4,
         )
 
         inferred_items = result.get("inferred_batch", [])
-        originals = dataset_day_json
-
-        if len(inferred_items) > len(originals):
-            inferred_items = inferred_items[: len(originals)]
-        elif len(inferred_items) < len(originals):
-            inferred_items += [{} for _ in range(len(originals) - len(inferred_items))]
-
-        full_items = []
-        for src, inf in zip(originals, inferred_items):
-            merged = {
-                # originals (pass-through)
-                "filename": src.get("filename"),
-                "rows": src.get("rows", None),
-                "status": _normalize_status(src.get("status")),
-                "is_duplicated": src.get("is_duplicated", None),
-                "file_size": src.get("file_size", None),
-                "uploaded_at": src.get("uploaded_at", None),
-                "status_message": src.get("status_message", None),
-                # inferred
-                "cleaned_filename": inf.get("cleaned_filename") or src.get("filename"),
-                "batch": inf.get("batch"),
-                "entity": inf.get("entity"),
-                "covered_date": inf.get("covered_date"),
-                "extension": inf.get("extension") or _infer_ext(src.get("filename")),
-            }
-            full_items.append(merged)
+        originals = files_for_cv
+
+        def _full_items():
+            # one merged record at a time, straight into the output file; missing
+            # inferences (short answers) count as {}
+            for src, inf in zip(originals, chain(inferred_items, repeat({}))):
+                yield {
+                    # originals (pass-through)
+                    "filename": src.get("filename"),
+                    "rows": src.get("rows", None),
+                    "status": _normalize_status(src.get("status")),
+                    "is_duplicated": src.get("is_duplicated", None),
+                    "file_size": src.get("file_size", None),
+                    "uploaded_at": src.get("uploaded_at", None),
+                    "status_message": src.get("status_message", None),
+                    # inferred
+                    "cleaned_filename": (
+                        inf.get("cleaned_filename") or src.get("filename")
+                    ),
+                    "batch": inf.get("batch"),
+                    "entity": inf.get("entity"),
+                    "covered_date": inf.get("covered_date"),
+                    "extension": (
+                        inf.get("extension") or _infer_ext(src.get("filename"))
+                    ),
+                }
 
         os.makedirs(output_dir, exist_ok=True)
 
         out_full = os.path.join(output_dir, f"{cv_to_check}_files.json")
-        with open(out_full, "w", encoding="utf-8") as fp:
-            json.dump({"inferred_batch": full_items}, fp, ensure_ascii=False, indent=2)
+        await asyncio.to_thread(write_records, out_full, _full_items())
 
         print(f"Done: {out_full}")
 
@@ -300,6 +382,9 @@ async def main():
             "239613",
         ]
 
+        # parsed once per day; each CV task gets its own slice of the file map
+        dataset_day = await asyncio.to_thread(_load_json, dataset_day_filepath)
+
         agent = make_extract_file_structure_agent()
 
         sem = asyncio.Semaphore(CONCURRENCY)
@@ -308,7 +393,7 @@ async def main():
             asyncio.create_task(
                 process_one_cv(
                     cv_to_check=cv_id,
-                    dataset_day_filepath=dataset_day_filepath,
+                    files_for_cv=dataset_day.get(cv_id, []),
                     output_dir=OUTPUT_DIR,
                     output_key=output_key,
                     agent=agent,
@@ -330,4 +415,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_main(main())
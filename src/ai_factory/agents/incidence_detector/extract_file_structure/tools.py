@@ -0,0 +1,137 @@
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+PLACEHOLDER_RE = re.compile(r"<([^<>]+)>")
+
+# date placeholders → (regex, strptime format); any other date-like slot is unknown
+DATE_TOKENS = {
+    "yyyymmdd": (r"\d{8}", "%Y%m%d"),
+    "yyyy-mm-dd": (r"\d{4}-\d{2}-\d{2}", "%Y-%m-%d"),
+    "yyyymmddhhmmss": (r"\d{14}", "%Y%m%d%H%M%S"),
+}
+
+
+class CompiledPattern(NamedTuple):
+    regex: re.Pattern
+    has_prefix: bool
+    # strptime format of the captured date slot, None if the pattern has no date
+    date_format: Optional[str]
+
+
+def _compile_pattern(pattern: str) -> Optional[CompiledPattern]:
+    """
+    Turns a CV filename pattern such as "<randomId>_<Entity>_batch_<batchNo>.csv"
+    into an anchored regex with entity/batch/date groups. Returns None when a slot
+    can't be matched deterministically (unknown date shape, repeated entity/batch,
+    two slots with no separator between them)
+    """
+    parts: List[str] = []
+    groups = set()
+    has_prefix = False
+    date_format = None
+    date_part = None
+    pos = 0
+    for m in PLACEHOLDER_RE.finditer(pattern):
+        if parts and m.start() == pos:
+            return None
+        parts.append(re.escape(pattern[pos : m.start()]))
+        pos = m.end()
+        name = m.group(1).strip().lower()
+        key = re.sub(r"[^a-z]", "", name)
+        if name in DATE_TOKENS:
+            date_rx, date_format = DATE_TOKENS[name]
+            # in a date range only the last (END) date is captured
+            if date_part is not None:
+                parts[date_part] = parts[date_part].replace("(?P<date>", "(?:")
+            date_part = len(parts)
+            parts.append(f"(?P<date>{date_rx})")
+        elif "date" in key or "yyyy" in key:
+            return None
+        elif "entity" in key or "batch" in key:
+            group = "entity" if "entity" in key else "batch"
+            if group in groups:
+                return None
+            groups.add(group)
+            parts.append(
+                r"(?P<entity>[^_]+)" if group == "entity" else r"(?P<batch>\d+)"
+            )
+        elif key == "randomid" and m.start() == 0 and pattern[pos : pos + 1] == "_":
+            has_prefix = True
+            parts.append(r"(?P<prefix>[^_]+)")
+        else:
+            parts.append(r"[^_]+")
+    parts.append(re.escape(pattern[pos:]))
+    try:
+        regex = re.compile("".join(parts) + r"\Z")
+    except re.error:
+        return None
+    return CompiledPattern(regex, has_prefix, date_format)
+
+
+@lru_cache(maxsize=512)
+def _compile_patterns(patterns: Tuple[str, ...]) -> Tuple[CompiledPattern, ...]:
+    compiled = (_compile_pattern(p) for p in dict.fromkeys(patterns) if "<" in p)
+    return tuple(c for c in compiled if c is not None)
+
+
+def _infer_one(
+    pattern: CompiledPattern, fname: str, entities: FrozenSet[str]
+) -> Optional[Dict[str, Any]]:
+    m = pattern.regex.match(fname)
+    if m is None:
+        return None
+    found = m.groupdict()
+    # the entity slot only resolves to an entity the CV has already seen
+    if "entity" in found and found["entity"] not in entities:
+        return None
+    covered_date = None
+    if pattern.date_format:
+        try:
+            covered = datetime.strptime(found["date"], pattern.date_format)
+        except ValueError:
+            return None
+        covered_date = covered.strftime("%Y-%m-%d")
+    cleaned = fname[len(found["prefix"]) + 1 :] if pattern.has_prefix else fname
+    _, ext = os.path.splitext(fname)
+    return {
+        "cleaned_filename": cleaned,
+        "batch": found.get("batch"),
+        "entity": found.get("entity"),
+        "covered_date": covered_date,
+        "extension": ext[1:].lower() if ext else None,
+    }
+
+
+def try_local_infer(
+    rules_obj: Dict[str, Any], fname: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """
+    Infers the file-structure fields of fname from the CV filename patterns alone.
+    Fails closed: returns None (left to the LLM) unless at least one pattern matches,
+    every matching pattern gives the same answer and any captured entity is one of the
+    CV's entity_counts keys
+    """
+    if not fname or not isinstance(rules_obj, dict):
+        return None
+    patterns = rules_obj.get("filename_patterns") or []
+    canonical = rules_obj.get("filename_canonical")
+    if not isinstance(patterns, list):
+        return None
+    if canonical:
+        patterns = [canonical, *patterns]
+    if not all(isinstance(p, str) for p in patterns):
+        return None
+    entity_counts = rules_obj.get("entity_counts")
+    entities = frozenset(entity_counts if isinstance(entity_counts, dict) else ())
+    result = None
+    for pattern in _compile_patterns(tuple(patterns)):
+        inferred = _infer_one(pattern, fname, entities)
+        if inferred is None:
+            continue
+        if result is not None and inferred != result:
+            return None
+        result = inferred
+    return result
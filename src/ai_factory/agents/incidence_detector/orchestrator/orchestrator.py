@@ -1,22 +1,25 @@
 import argparse
 import asyncio
 import csv
-import glob
-import json
+import multiprocessing
+import orjson
 import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from google.adk.agents import Agent
-from google.adk.models.lite_llm import LiteLlm
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from google.genai import types
 
 from ai_factory.agents.incidence_detector.extract_file_structure.schemas import (
     InferredBatchOutput,
 )
+from ai_factory.agents.incidence_detector.extract_file_structure.tools import (
+    try_local_infer,
+)
 from ai_factory.agents.incidence_detector.extract_file_structure.prompts import (
     model_instruction,
     model_description,
@@ -40,8 +43,23 @@ from ai_factory.agents.incidence_detector.detect_missing_file.agents import (
     MissingFileDetectorSimple,
 )
 
+from ai_factory.agents.incidence_detector.utils import (
+    drop_primed_cvs,
+    load_cv,
+    prime_cvs,
+    read_cv,
+    write_records,
+)
+from ai_factory.agents.cv_extracter.cache import cache_scope, get_cached, put_cached
+
 # === Config ===
 from ai_factory.config import config
+from ai_factory.utils import (
+    iter_file_entries,
+    make_lite_llm,
+    make_user_content,
+    run_main,
+)
 
 TARGET_MODEL = config.default_model
 MODEL_NAME = "file_formatter_agent"
@@ -50,24 +68,43 @@ OUTPUT_KEY = "file_formatted"
 BATCH_SIZE = 20
 BATCH_CONCURRENCY = 4
 CV_CONCURRENCY = 4
+CV_PREFETCH_WORKERS = 8
+# FILE_STRUCTURE_LLM_CACHE=0 forces fresh LLM calls for every batch
+USE_LLM_CACHE = os.getenv("FILE_STRUCTURE_LLM_CACHE", "1") != "0"
 
 CUSTOM_OUTPUTS_DIR = "custom_outputs/complete_sections"
 
+# detector workers come from a forkserver on Linux: it starts single-threaded and
+# imports ADK/litellm once, so workers neither re-import them nor inherit the locks
+# of this process's threads (to_thread writes, HTTP client)
+_MP_CONTEXT = (
+    multiprocessing.get_context("forkserver") if sys.platform == "linux" else None
+)
+
+
+_STATUS_MAP = {
+    "processed": "processed",
+    "success": "processed",
+    "ok": "processed",
+    "failed": "failed",
+    "error": "failed",
+    "empty": "empty",
+    "unknown": "unknown",
+}
+_STATUS_CANON = frozenset(_STATUS_MAP.values())
+
 
 def _normalize_status(s: Any) -> Optional[str]:
     if not s:
         return None
-    s = str(s).strip().lower()
-    m = {
-        "processed": "processed",
-        "success": "processed",
-        "ok": "processed",
-        "failed": "failed",
-        "error": "failed",
-        "empty": "empty",
-        "unknown": "unknown",
-    }
-    return m.get(s, None)
+    if type(s) is str:
+        # already canonical values (the usual case) skip strip/lower entirely
+        if s in _STATUS_CANON:
+            return s
+        s = s.strip().lower()
+    else:
+        s = str(s).strip().lower()
+    return _STATUS_MAP.get(s)
 
 
 def _infer_ext(fn: Optional[str]) -> Optional[str]:
@@ -79,13 +116,15 @@ def _infer_ext(fn: Optional[str]) -> Optional[str]:
 
 def _write_json(path: str, data: Any):
     os.makedirs(os.path.dirname(path), exist_ok=True) if os.path.dirname(path) else None
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(path, "wb") as f:
+        f.write(
+            orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        )
 
 
 def _load_json(path: str) -> Any:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def _suggest_action(inc: Dict[str, Any]) -> str:
@@ -187,7 +226,7 @@ def _exec_date_from_day_target(day_target: str) -> str:
 # ---------- extract_file_structure ----------
 def make_extract_file_structure_agent() -> Agent:
     return Agent(
-        model=LiteLlm(model=TARGET_MODEL),
+        model=make_lite_llm(TARGET_MODEL, model_instruction),
         name=MODEL_NAME,
         instruction=model_instruction,
         description=model_description,
@@ -196,6 +235,13 @@ def make_extract_file_structure_agent() -> Agent:
     )
 
 
+def _rules_json(filename_pattern_section: Dict[str, Any]) -> bytes:
+    rules_obj = filename_pattern_section.get(
+        "filename_pattern_section", filename_pattern_section
+    )
+    return orjson.dumps(rules_obj, option=orjson.OPT_SORT_KEYS)
+
+
 async def _run_single_batch(
     *,
     app_name: str,
@@ -207,39 +253,68 @@ async def _run_single_batch(
     files_batch: List[Dict[str, Any]],
     output_key: str,
     enforce_stateless: bool = True,
+    use_cache: bool = USE_LLM_CACHE,
+    rules_json: Optional[bytes] = None,
+    runner: Optional[Runner] = None,
 ) -> Dict[str, Any]:
-    svc = InMemorySessionService() if enforce_stateless else session_service
-    session = await svc.create_session(app_name=app_name, user_id=user_id)
-    runner = Runner(agent=agent, app_name=app_name, session_service=svc)
-
-    rules_obj = filename_pattern_section.get(
-        "filename_pattern_section", filename_pattern_section
-    )
+    if rules_json is None:
+        rules_json = _rules_json(filename_pattern_section)
     slim_files = [
         {"filename": f.get("filename"), "status": f.get("status")} for f in files_batch
     ]
 
-    input_json = {
-        "datasource_id": datasource_id,
-        "context": {"filename_pattern_section": rules_obj},
-        "files": slim_files,
-    }
-    new_message = types.Content(
-        role="user", parts=[types.Part(text=json.dumps(input_json))]
-    )
-
-    async for _ in runner.run_async(
-        user_id=user_id, session_id=session.id, new_message=new_message
-    ):
-        pass
+    # byte-for-byte orjson.dumps(input, OPT_SORT_KEYS) of
+    # {"datasource_id", "context": {"filename_pattern_section": rules}, "files"},
+    # with the CV rules spliced in pre-serialized. The same text is the prompt and
+    # (with the agent scope) the cache key
+    payload = (
+        b'{"context":{"filename_pattern_section":'
+        + rules_json
+        + b'},"datasource_id":'
+        + orjson.dumps(datasource_id)
+        + b',"files":'
+        + orjson.dumps(slim_files, option=orjson.OPT_SORT_KEYS)
+        + b"}"
+    ).decode()
+
+    scope = None
+    if use_cache:
+        # same model + prompt + rules + files always map to the same inference
+        scope = cache_scope(agent)
+        cached = await asyncio.to_thread(get_cached, agent.name, payload, scope)
+        if cached is not None:
+            return cached
+
+    if runner is None:
+        svc = InMemorySessionService() if enforce_stateless else session_service
+        runner = Runner(agent=agent, app_name=app_name, session_service=svc)
+    # a fresh session per batch keeps batches stateless on a shared runner
+    svc = runner.session_service
+    session = await svc.create_session(app_name=app_name, user_id=user_id)
+    new_message = make_user_content(payload)
 
-    refreshed = await svc.get_session(
-        app_name=app_name, user_id=user_id, session_id=session.id
-    )
-    result = refreshed.state.get(output_key)
+    try:
+        # single LlmAgent: its output_key is in state once the final response arrives
+        async for event in runner.run_async(
+            user_id=user_id, session_id=session.id, new_message=new_message
+        ):
+            if event.is_final_response():
+                break
+
+        refreshed = await svc.get_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
+        result = refreshed.state.get(output_key)
+    finally:
+        await svc.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session.id
+        )
     if hasattr(result, "model_dump"):
         result = result.model_dump()
     if isinstance(result, dict) and "inferred_batch" in result:
+        # only complete batches are kept, a short answer is retried next run
+        if scope and len(result["inferred_batch"]) == len(files_batch):
+            await asyncio.to_thread(put_cached, agent.name, payload, result, scope)
         return result
     return {"inferred_batch": []}
 
@@ -256,10 +331,33 @@ async def _process_file_batched(
     files_all: List[Dict[str, Any]],
     batch_size: int = BATCH_SIZE,
     batch_concurrency: int = BATCH_CONCURRENCY,
+    use_local_rules: bool = True,
 ) -> Dict[str, Any]:
-    total = len(files_all)
+    # files the CV filename patterns resolve on their own never reach the LLM
+    rules_obj = filename_pattern_section.get(
+        "filename_pattern_section", filename_pattern_section
+    )
+    resolved: List[Optional[Dict[str, Any]]] = [
+        try_local_infer(rules_obj, f.get("filename")) if use_local_rules else None
+        for f in files_all
+    ]
+    llm_idxs = [i for i, inf in enumerate(resolved) if inf is None]
+    if len(llm_idxs) < len(files_all):
+        print(
+            f"[INFO] {datasource_id}: {len(files_all) - len(llm_idxs)} files "
+            "inferred from filename patterns"
+        )
+    files_llm = [files_all[i] for i in llm_idxs]
+    # every batch of the CV embeds the same rules, serialized here once, and runs
+    # on one Runner over a per-CV session service (each batch gets its own session)
+    rules_json = _rules_json(filename_pattern_section)
+    runner = Runner(
+        agent=agent, app_name=app_name, session_service=InMemorySessionService()
+    )
+
+    total = len(files_llm)
     batches = [
-        (start, files_all[start : start + batch_size])
+        (start, files_llm[start : start + batch_size])
         for start in range(0, total, batch_size)
     ]
     sem_batches = asyncio.Semaphore(batch_concurrency)
@@ -276,6 +374,8 @@ async def _process_file_batched(
                 files_batch=files_batch,
                 output_key=output_key,
                 enforce_stateless=True,
+                rules_json=rules_json,
+                runner=runner,
             )
             items = inferred.get("inferred_batch", [])
             if len(items) != len(files_batch):
@@ -284,21 +384,17 @@ async def _process_file_batched(
                 )
             else:
                 print(f"[INFO] Batch {start_idx}: {len(items)} items")
-            return (start_idx, items)
+            return items
 
-    tasks = [asyncio.create_task(run_one(start, batch)) for (start, batch) in batches]
-    results: List[tuple[int, List[Dict[str, Any]]]] = []
-    merged: List[Dict[str, Any]] = []
-
-    for coro in asyncio.as_completed(tasks):
-        start_idx, items = await coro
-        results.append((start_idx, items))
+    # gather keeps submission order; LLM items go back to their files' positions,
+    # a short batch leaves {} for its unanswered files
+    results = await asyncio.gather(*(run_one(start, batch) for start, batch in batches))
 
-    results.sort(key=lambda t: t[0])
-    for _, items in results:
-        merged.extend(items)
+    for (start, files_batch), items in zip(batches, results):
+        for k, item in enumerate(items[: len(files_batch)]):
+            resolved[llm_idxs[start + k]] = item
 
-    return {"inferred_batch": merged}
+    return {"inferred_batch": [inf if inf is not None else {} for inf in resolved]}
 
 
 async def _extract_one_cv(
@@ -333,7 +429,8 @@ async def _extract_one_cv(
             )
         return passthrough
 
-    cv_json_extracted = _load_json(cv_rules_path)
+    # today and last-weekday runs share the parse through load_cv's cache
+    cv_json_extracted = load_cv(cv_rules_path)
     filename_pattern_json = cv_json_extracted.get(
         "filename_pattern_section", cv_json_extracted
     )
@@ -414,25 +511,29 @@ async def _process_dataset(
                 session_service=session_service,
             )
             # write structure
+            # writes go to a worker thread so other CVs' LLM calls keep moving
             cv_struct_path = os.path.join(out_base_struct, f"{cv_id}_files.json")
-            _write_json(cv_struct_path, {"inferred_batch": merged_items})
+            await asyncio.to_thread(write_records, cv_struct_path, merged_items)
 
             # dedupe
             dedup = dedupe_records(merged_items)
             stats = dedup["stats"]
 
+            # the three dedupe outputs are independent files, written side by side
             stem = f"{cv_id}_files"
-            _write_json(
-                os.path.join(out_base_clean, f"{stem}_cleaned.json"),
-                {"inferred_batch": dedup["final"]},
-            )
-            _write_json(
-                os.path.join(out_base_clean, f"{stem}_removed.json"),
-                {"inferred_batch": dedup["removed"]},
-            )
-            _write_json(
-                os.path.join(out_base_clean, f"{stem}_harmless.json"),
-                {"inferred_batch": dedup["harmless"]},
+            await asyncio.gather(
+                *(
+                    asyncio.to_thread(
+                        write_records,
+                        os.path.join(out_base_clean, f"{stem}_{suffix}.json"),
+                        dedup[key],
+                    )
+                    for suffix, key in (
+                        ("cleaned", "final"),
+                        ("removed", "removed"),
+                        ("harmless", "harmless"),
+                    )
+                )
             )
 
             anomalies_count = 0
@@ -443,7 +544,7 @@ async def _process_dataset(
                 cv_anom_path = os.path.join(
                     out_base_anoms, f"{cv_id}_dup_fail_anomalies.json"
                 )
-                _write_json(cv_anom_path, anomalies)
+                await asyncio.to_thread(_write_json, cv_anom_path, anomalies)
                 anomalies_count = len(anomalies)
 
             return {
@@ -465,10 +566,13 @@ async def _process_dataset(
     anomalies_aggregate_path = None
     if compute_anomalies:
         os.makedirs(out_base_anoms, exist_ok=True)
+        # open directly instead of exists() + open: one syscall less per CV
         for cv_id in files_map.keys():
             p = os.path.join(out_base_anoms, f"{cv_id}_dup_fail_anomalies.json")
-            if os.path.exists(p):
+            try:
                 all_anoms.extend(_load_json(p))
+            except FileNotFoundError:
+                continue
         agg_path = os.path.join(out_base_anoms, "_ALL_anomalies.json")
         _write_json(agg_path, all_anoms)
         anomalies_aggregate_path = agg_path
@@ -536,19 +640,20 @@ async def _run_detectors_for_path(
     sched_anoms = sched_res.get("anomalies", [])
     miss_anoms = (miss_res.get("anomalies") or {}).get("inferred_batch", [])
 
-    _write_json(
-        os.path.join(out_base_anoms_today, f"{rid}_unexpected_empty_anomalies.json"),
-        empty_anoms,
-    )
-    _write_json(
-        os.path.join(out_base_anoms_today, f"{rid}_volume_anomalies.json"), vol_anoms
-    )
-    _write_json(
-        os.path.join(out_base_anoms_today, f"{rid}_schedule_anomalies.json"),
-        sched_anoms,
-    )
-    _write_json(
-        os.path.join(out_base_anoms_today, f"{rid}_missing_anomalies.json"), miss_anoms
+    await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                _write_json,
+                os.path.join(out_base_anoms_today, f"{rid}_{kind}_anomalies.json"),
+                anoms,
+            )
+            for kind, anoms in (
+                ("unexpected_empty", empty_anoms),
+                ("volume", vol_anoms),
+                ("schedule", sched_anoms),
+                ("missing", miss_anoms),
+            )
+        )
     )
 
     merged: List[dict] = []
@@ -559,6 +664,38 @@ async def _run_detectors_for_path(
     return merged
 
 
+def _detect_one_path(
+    cleaned_json_path: str,
+    out_base_anoms_today: str,
+    exec_date_iso: str,
+    base_clean_dir: str,
+    cvs: Optional[List[tuple]] = None,
+) -> list[dict]:
+    # top-level so ProcessPoolExecutor can pickle it; each worker drives its own loop.
+    # cvs are the path's CVs already read by the parent, parsed here on first use
+    prime_cvs(cvs or [])
+    try:
+        return asyncio.run(
+            _run_detectors_for_path(
+                cleaned_json_path=cleaned_json_path,
+                out_base_anoms_today=out_base_anoms_today,
+                exec_date_iso=exec_date_iso,
+                base_clean_dir=base_clean_dir,
+            )
+        )
+    finally:
+        drop_primed_cvs()
+
+
+def _path_cv_paths(cleaned_json_path: str) -> set[str]:
+    # both resource-id spellings in use (orchestrator and detectors)
+    stem = Path(cleaned_json_path).stem
+    return {
+        f"{CUSTOM_OUTPUTS_DIR}/{rid}_native.md.json"
+        for rid in (stem.split("_")[0], stem.removesuffix("_files_cleaned"))
+    }
+
+
 async def _run_today_detectors_and_aggregate(
     day_target: str,
     base_anoms_dir: str,
@@ -572,22 +709,48 @@ async def _run_today_detectors_and_aggregate(
     out_base_anoms_today = os.path.join(base_anoms_dir, "today_files")
     os.makedirs(out_base_anoms_today, exist_ok=True)
 
-    paths = glob.glob(os.path.join(cleaned_dir, "*_files_cleaned.json"))
+    # one scandir pass; the entry type answers is_file, so no per-path stat
+    try:
+        paths = [
+            entry.path
+            for entry in iter_file_entries(cleaned_dir)
+            if entry.name.endswith("_files_cleaned.json")
+        ]
+    except FileNotFoundError:
+        paths = []
     if not paths:
         return []
 
-    sem = asyncio.Semaphore(8)
-
-    async def _one(p: str):
-        async with sem:
-            return await _run_detectors_for_path(
-                cleaned_json_path=p,
-                out_base_anoms_today=out_base_anoms_today,
-                exec_date_iso=exec_date_iso,
-                base_clean_dir=base_clean_dir,
-            )
-
-    bundles = await asyncio.gather(*[_one(p) for p in paths])
+    # the CVs are read concurrently here, before the pool starts, and each worker
+    # gets its path's bytes, so workers only parse them
+    path_cvs = {p: _path_cv_paths(p) for p in paths}
+    all_cv_paths = set().union(*path_cvs.values())
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=CV_PREFETCH_WORKERS) as ex:
+        read = await asyncio.gather(
+            *(loop.run_in_executor(ex, read_cv, cv_path) for cv_path in all_cv_paths)
+        )
+    cvs_by_path = {cv[0]: cv for cv in read if cv is not None}
+
+    # the detectors are pure-CPU JSON passes with no await inside, so files are
+    # spread over worker processes instead of sharing this event loop's thread
+    with ProcessPoolExecutor(
+        max_workers=min(len(paths), os.cpu_count() or 1), mp_context=_MP_CONTEXT
+    ) as pool:
+        bundles = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    pool,
+                    _detect_one_path,
+                    p,
+                    out_base_anoms_today,
+                    exec_date_iso,
+                    base_clean_dir,
+                    [cvs_by_path[cv] for cv in path_cvs[p] if cv in cvs_by_path],
+                )
+                for p in paths
+            ]
+        )
     merged: List[dict] = []
     for b in bundles:
         merged.extend(b)
@@ -653,7 +816,7 @@ async def orchestrate(
 
     summary_path = f"{base_anoms_dir}/_SUMMARY.json"
     _write_json(summary_path, summary)
-    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(orjson.dumps(summary, option=orjson.OPT_INDENT_2).decode())
     return summary
 
 
@@ -675,7 +838,7 @@ def _parse_args():
 if __name__ == "__main__":
     args = _parse_args()
     try:
-        asyncio.run(
+        run_main(
             orchestrate(
                 day_target=args.date,
                 files_json_path=args.files_json,
@@ -0,0 +1,81 @@
+import os
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import orjson
+
+# raw CV bytes handed over by another process, keyed like load_cv_cached
+_PRIMED_CVS: Dict[Tuple[str, int], bytes] = {}
+
+
+def cv_mtime_ns(cv_path: str) -> Optional[int]:
+    try:
+        return os.stat(cv_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@lru_cache(maxsize=128)
+def load_cv_cached(cv_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """
+    Parsed CV sections file, shared by every detector of the process. The mtime is part
+    of the key so a rewritten CV is parsed again. Callers must treat it as read-only
+    """
+    data = _PRIMED_CVS.pop((cv_path, mtime_ns), None)
+    if data is None:
+        with open(cv_path, "rb") as f:
+            data = f.read()
+    return orjson.loads(data)
+
+
+def read_cv(cv_path: str) -> Optional[Tuple[str, int, bytes]]:
+    """
+    Raw (cv_path, mtime_ns, bytes) of a CV for prime_cvs, or None when it was never
+    extracted
+    """
+    mtime_ns = cv_mtime_ns(cv_path)
+    if mtime_ns is None:
+        return None
+    try:
+        with open(cv_path, "rb") as f:
+            return cv_path, mtime_ns, f.read()
+    except FileNotFoundError:
+        return None
+
+
+def prime_cvs(entries: Iterable[Tuple[str, int, bytes]]):
+    """
+    Hands CVs read elsewhere (see read_cv) to load_cv_cached, so this process parses
+    them without reading the files again. Entries whose CV was rewritten since are
+    never used; drop_primed_cvs discards the leftovers
+    """
+    for cv_path, mtime_ns, data in entries:
+        _PRIMED_CVS[(cv_path, mtime_ns)] = data
+
+
+def drop_primed_cvs():
+    _PRIMED_CVS.clear()
+
+
+def load_cv(cv_path: str) -> Dict[str, Any]:
+    # {} when the CV was never extracted, like the detectors' previous exists() check
+    mtime_ns = cv_mtime_ns(cv_path)
+    if mtime_ns is None:
+        return {}
+    return load_cv_cached(cv_path, mtime_ns)
+
+
+def write_records(path: str, records: Iterable[Dict[str, Any]]):
+    """
+    Writes {"inferred_batch": [...]} one record at a time (one compact record per
+    line), so only a single serialized record is held in memory, never the whole file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True) if os.path.dirname(path) else None
+    with open(path, "wb") as f:
+        f.write(b'{"inferred_batch": [')
+        sep = b"\n  "
+        for rec in records:
+            f.write(sep)
+            f.write(orjson.dumps(rec, option=orjson.OPT_NON_STR_KEYS))
+            sep = b",\n  "
+        f.write(b"\n]}\n")
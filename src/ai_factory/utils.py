@@ -1,10 +1,153 @@
+import asyncio
+import hashlib
 import os
+from functools import lru_cache
 from pathlib import Path
+from typing import AsyncGenerator, Iterator
 
+import httpx
+import litellm
+from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from litellm.llms.base_llm.base_utils import type_to_response_format_param
 
-def get_file_list(folder_path: Path):
-    files_list = os.listdir(folder_path)
-    files_path = sorted(
-        [os.path.join(folder_path, file_path) for file_path in files_list]
+
+def iter_file_entries(folder_path: Path) -> Iterator[os.DirEntry]:
+    """
+    Yields the regular files of a folder in one readdir pass. is_file(follow_symlinks=False)
+    answers from the directory entry type, so no extra stat is issued per entry
+    """
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def get_file_list(folder_path: Path, largest_first: bool = False):
+    """
+    Lists the files of a folder (sub folders are skipped) sorted by path, or by size
+    descending when largest_first is set so long jobs start early under bounded concurrency
+    """
+    files = list(iter_file_entries(folder_path))
+    if largest_first:
+        files.sort(key=lambda entry: (-entry.stat().st_size, entry.path))
+    else:
+        files.sort(key=lambda entry: entry.path)
+    return [entry.path for entry in files]
+
+
+def write_bytes_atomic(path: Path, data: bytes) -> Path:
+    """
+    Writes data next to path and renames it over path, so readers (and reruns that
+    skip existing outputs) never see a half written file
+    """
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def make_user_content(text: str) -> types.Content:
+    """
+    User message for runner.run_async. Only the text varies and it is always a str
+    built here, so the pydantic validation of Content/Part is skipped
+    """
+    return types.Content.model_construct(
+        role="user", parts=[types.Part.model_construct(text=text)]
     )
-    return files_path
+
+
+def run_main(main_coro):
+    """
+    Runs the main coroutine on uvloop when it is installed (libuv event loop, faster
+    socket readiness handling for many concurrent LLM calls), else on plain asyncio
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(main_coro)
+    return uvloop.run(main_coro)
+
+
+def _is_openai_model(model: str) -> bool:
+    return "/" not in model or model.startswith("openai/")
+
+
+def _is_anthropic_model(model: str) -> bool:
+    return model.startswith(("anthropic/", "bedrock/")) and "claude" in model
+
+
+@lru_cache(maxsize=None)
+def _prompt_cache_key(instruction: str) -> str:
+    return hashlib.sha256(instruction.encode("utf-8")).hexdigest()[:32]
+
+
+@lru_cache(maxsize=None)
+def _response_format(output_schema: type) -> dict:
+    return type_to_response_format_param(output_schema)
+
+
+def warm_response_formats(agent) -> None:
+    """
+    Builds the response format of every output_schema in an agent tree before the
+    first request, so that cost is not paid inside the first file's LLM call
+    """
+    if getattr(agent, "output_schema", None) is not None:
+        _response_format(agent.output_schema)
+    for sub_agent in agent.sub_agents:
+        warm_response_formats(sub_agent)
+
+
+class SchemaCachedLiteLlm(LiteLlm):
+    """
+    LiteLlm that sends the agent's output_schema as a prebuilt json_schema response
+    format. litellm otherwise regenerates the strict JSON schema from the pydantic
+    class on every request; here it is built once per schema class, and the provider
+    receives the same schema object on every call
+    """
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        config = llm_request.config
+        if config is not None and isinstance(config.response_schema, type):
+            config.response_schema = _response_format(config.response_schema)
+        async for response in super().generate_content_async(llm_request, stream):
+            yield response
+
+
+def make_lite_llm(model: str, instruction: str) -> LiteLlm:
+    """
+    Builds the LiteLlm wrapper of an agent. The instruction is hashed once here and sent
+    as prompt_cache_key, so every request of the agent is routed to the same provider
+    prompt cache and the static system prompt is billed/processed as cached tokens.
+    Anthropic models have no automatic prefix cache, so the system message is marked
+    with an ephemeral cache_control breakpoint instead
+    """
+    kwargs = {}
+    if _is_openai_model(model):
+        kwargs["prompt_cache_key"] = _prompt_cache_key(instruction)
+    elif _is_anthropic_model(model):
+        kwargs["cache_control_injection_points"] = [
+            {"location": "message", "role": "system"}
+        ]
+    return SchemaCachedLiteLlm(model=model, **kwargs)
+
+
+def use_shared_http_client(max_connections: int) -> httpx.AsyncClient:
+    """
+    Installs one keep-alive httpx pool as litellm's async client session, so concurrent
+    agent calls reuse warm TLS connections instead of handshaking per request.
+    The pool lives for the whole process (one run_main per process)
+    """
+    if litellm.aclient_session is None:
+        litellm.aclient_session = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+    return litellm.aclient_session